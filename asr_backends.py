@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+
+"""
+Speech-to-text backends for RealTimeSpeechRecognizer.
+
+google:  Google Web Speech API through speech_recognition (network round trip
+         per phrase, needs the venue's internet connection)
+vosk:    Vosk/Kaldi, CPU-only, fully offline (pip install vosk, plus a model
+         from https://alphacephei.com/vosk/models - default models/vosk or
+         $VOSK_MODEL)
+whisper: faster-whisper (CTranslate2, int8 on CPU), fully offline
+         (pip install faster-whisper - default model base.en or $WHISPER_MODEL)
+
+Every backend takes a speech_recognition AudioData phrase and returns a
+Recognition - the best transcript plus up to max_alternatives ranked
+hypotheses - or None when nothing intelligible was heard. Network failures
+surface as sr.RequestError, as they did before.
+
+Backends also recognize a phrase while it is still being spoken: stream()
+returns a RecognitionStream that is fed PCM chunks as they are captured and
+reports partial hypotheses. Vosk decodes incrementally; the other backends
+re-transcribe the phrase so far every partial_interval seconds of new audio
+(for google that is one upload per partial).
+
+Benchmark backends against recorded phrases (see --record-audio in main.py;
+an optional .txt next to each .wav holds the reference transcript):
+  python asr_backends.py recordings/
+  python asr_backends.py recordings/*.wav --backends vosk whisper
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import speech_recognition as sr
+
+from environment_matcher import edit_distance
+
+BACKENDS = ('google', 'vosk', 'whisper')
+SAMPLE_RATE = 16000  # Local engines want 16 kHz mono 16-bit PCM
+
+class Recognition(NamedTuple):
+    text: str
+    confidence: Optional[float]  # None when the engine doesn't report one
+    alternatives: Tuple[str, ...] = ()  # Ranked hypotheses, text first
+
+class RecognitionStream(ABC):
+    """Incremental recognition of one phrase"""
+
+    @abstractmethod
+    def accept(self, pcm: bytes) -> Optional[str]:
+        """Feed captured audio; returns the partial transcript when it changed"""
+
+    @abstractmethod
+    def finish(self) -> Optional[Recognition]:
+        """Final recognition of the whole phrase"""
+
+class ASRBackend(ABC):
+    name = "base"
+    max_alternatives = 1
+
+    @abstractmethod
+    def transcribe(self, audio: sr.AudioData) -> Optional[Recognition]:
+        """Best transcript and alternatives for a whole phrase, or None"""
+
+    def stream(self, sample_rate: int, sample_width: int = 2,
+               partial_interval: Optional[float] = None) -> RecognitionStream:
+        return BufferedStream(self, sample_rate, sample_width, partial_interval)
+
+class BufferedStream(RecognitionStream):
+    """Partials for whole-phrase backends by re-transcribing the audio so far"""
+
+    def __init__(self, backend: ASRBackend, sample_rate: int, sample_width: int,
+                 partial_interval: Optional[float] = None):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.partial_interval = partial_interval  # None: no partials, only the final transcript
+        self.buffer = bytearray()
+        self._partial_at = 0
+        self._last_partial = None
+
+    def _audio(self) -> sr.AudioData:
+        return sr.AudioData(bytes(self.buffer), self.sample_rate, self.sample_width)
+
+    def accept(self, pcm: bytes) -> Optional[str]:
+        self.buffer.extend(pcm)
+        if not self.partial_interval:
+            return None
+        if len(self.buffer) - self._partial_at < self.partial_interval * self.sample_rate * self.sample_width:
+            return None
+        self._partial_at = len(self.buffer)
+        result = self.backend.transcribe(self._audio())
+        if not result or result.text == self._last_partial:
+            return None
+        self._last_partial = result.text
+        return result.text
+
+    def finish(self) -> Optional[Recognition]:
+        return self.backend.transcribe(self._audio()) if self.buffer else None
+
+class GoogleBackend(ASRBackend):
+    name = "google"
+
+    def __init__(self, recognizer: Optional[sr.Recognizer] = None, language: str = "en-US", max_alternatives: int = 5):
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+        self.max_alternatives = max_alternatives
+
+    def transcribe(self, audio: sr.AudioData) -> Optional[Recognition]:
+        # One upload per phrase: show_all returns every hypothesis with its confidence
+        try:
+            result = self.recognizer.recognize_google(audio, language=self.language, show_all=True)
+        except sr.UnknownValueError:  # Newer speech_recognition raises where older versions return []
+            return None
+        if not isinstance(result, dict):
+            return None
+        alternatives = [alternative for alternative in result.get('alternative', [])
+                        if alternative.get('transcript', '').strip()]
+        if not alternatives:
+            return None
+        texts = tuple(dict.fromkeys(alternative['transcript'].strip() for alternative in alternatives))
+        return Recognition(texts[0], alternatives[0].get('confidence'), texts[:self.max_alternatives])
+
+class VoskBackend(ASRBackend):
+    name = "vosk"
+
+    def __init__(self, model_path: Optional[str] = None, max_alternatives: int = 5):
+        try:
+            from vosk import KaldiRecognizer, Model, SetLogLevel
+        except ImportError:
+            raise RuntimeError("Vosk backend needs the vosk package: pip install vosk")
+        model_path = model_path or os.getenv('VOSK_MODEL', os.path.join("models", "vosk"))
+        if not os.path.isdir(model_path):
+            raise RuntimeError(f"Vosk model not found at {model_path} - download one from "
+                               "https://alphacephei.com/vosk/models and pass --asr-model")
+        SetLogLevel(-1)
+        print(f"🧠 Loading Vosk model from {model_path}...")
+        self.model = Model(model_path)
+        self._recognizer_class = KaldiRecognizer
+        self.max_alternatives = max_alternatives
+
+    def transcribe(self, audio: sr.AudioData) -> Optional[Recognition]:
+        stream = self.stream(SAMPLE_RATE)
+        stream.accept(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2))
+        return stream.finish()
+
+    def stream(self, sample_rate: int, sample_width: int = 2,
+               partial_interval: Optional[float] = None) -> RecognitionStream:
+        return VoskStream(self, sample_rate)
+
+class VoskStream(RecognitionStream):
+    """Native incremental decoding; Vosk's own endpoints split the phrase into segments"""
+
+    def __init__(self, backend: VoskBackend, sample_rate: int):
+        self.recognizer = backend._recognizer_class(backend.model, sample_rate)
+        if backend.max_alternatives > 1:
+            self.recognizer.SetMaxAlternatives(backend.max_alternatives)
+        else:
+            self.recognizer.SetWords(True)
+        self.segments: List[Recognition] = []
+        self._last_partial = ""
+
+    @staticmethod
+    def _parse(result: dict) -> Optional[Recognition]:
+        if 'alternatives' in result:
+            # N-best lattice output; its scores are unnormalized, so no confidence
+            texts = tuple(dict.fromkeys(alternative['text'].strip() for alternative in result['alternatives']
+                                        if alternative.get('text', '').strip()))
+            return Recognition(texts[0], None, texts) if texts else None
+
+        text = result.get('text', '').strip()
+        if not text:
+            return None
+        words = result.get('result', [])
+        confidence = sum(word['conf'] for word in words) / len(words) if words else None
+        return Recognition(text, confidence, (text,))
+
+    def accept(self, pcm: bytes) -> Optional[str]:
+        if self.recognizer.AcceptWaveform(pcm):
+            segment = self._parse(json.loads(self.recognizer.Result()))
+            if segment:
+                self.segments.append(segment)
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+        text = " ".join([segment.text for segment in self.segments] + [partial]).strip()
+        if not text or text == self._last_partial:
+            return None
+        self._last_partial = text
+        return text
+
+    def finish(self) -> Optional[Recognition]:
+        last = self._parse(json.loads(self.recognizer.FinalResult()))
+        if last:
+            self.segments.append(last)
+        if not self.segments:
+            return None
+        # Earlier segments are settled; only the last one keeps its alternatives
+        prefix = " ".join(segment.text for segment in self.segments[:-1])
+        final = self.segments[-1]
+        return Recognition(f"{prefix} {final.text}".strip(), final.confidence,
+                           tuple(f"{prefix} {text}".strip() for text in final.alternatives))
+
+class WhisperBackend(ASRBackend):
+    name = "whisper"
+
+    def __init__(self, model: Optional[str] = None, threads: int = 0):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("Whisper backend needs the faster-whisper package: pip install faster-whisper")
+        model = model or os.getenv('WHISPER_MODEL', "base.en")
+        print(f"🧠 Loading Whisper model {model} (int8, CPU)...")
+        self.model = WhisperModel(model, device="cpu", compute_type="int8", cpu_threads=threads)
+
+    def transcribe(self, audio: sr.AudioData) -> Optional[Recognition]:
+        pcm = np.frombuffer(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2), dtype=np.int16)
+        segments, _ = self.model.transcribe(pcm.astype(np.float32) / 32768.0, language="en", beam_size=1,
+                                            condition_on_previous_text=False)
+        segments = list(segments)
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            return None
+        confidence = math.exp(sum(segment.avg_logprob for segment in segments) / len(segments))
+        return Recognition(text, confidence, (text,))
+
+def create_backend(name: str, recognizer: Optional[sr.Recognizer] = None, model: Optional[str] = None,
+                   max_alternatives: int = 5) -> ASRBackend:
+    if name == 'google':
+        return GoogleBackend(recognizer, max_alternatives=max_alternatives)
+    if name == 'vosk':
+        return VoskBackend(model, max_alternatives=max_alternatives)
+    if name == 'whisper':
+        return WhisperBackend(model)
+    raise ValueError(f"Unknown ASR backend '{name}' (choose from {', '.join(BACKENDS)})")
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level edit distance divided by reference length"""
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    if not ref:
+        return float(bool(hyp))
+    return edit_distance(ref, hyp, limit=len(ref) + len(hyp)) / len(ref)
+
+def load_recordings(paths: List[str]) -> List[tuple]:
+    """(path, AudioData, duration seconds, reference transcript or None) per .wav"""
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.wav"))) if os.path.isdir(path) else [path])
+    recordings = []
+    recognizer = sr.Recognizer()
+    for path in files:
+        with sr.AudioFile(path) as source:
+            audio = recognizer.record(source)
+        duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding='utf-8') as f:
+                reference = f.read().strip()
+        recordings.append((path, audio, duration, reference))
+    return recordings
+
+def benchmark(backend: ASRBackend, recordings: List[tuple]) -> dict:
+    latencies, errors, failures = [], [], 0
+    for path, audio, duration, reference in recordings:
+        start = time.perf_counter()
+        try:
+            result = backend.transcribe(audio)
+        except sr.RequestError as e:
+            print(f"   ❌ {os.path.basename(path)}: {e}")
+            failures += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        text = result.text if result else ""
+        if reference is not None:
+            errors.append(word_error_rate(reference, text))
+        print(f"   {os.path.basename(path)} ({latencies[-1] * 1000:.0f} ms): {text or '(nothing)'}")
+
+    audio_seconds = sum(duration for _, _, duration, _ in recordings)
+    return {
+        'phrases': len(recordings),
+        'failures': failures,
+        'mean_ms': float(np.mean(latencies) * 1000) if latencies else None,
+        'p95_ms': float(np.percentile(latencies, 95) * 1000) if latencies else None,
+        'real_time_factor': sum(latencies) / audio_seconds if latencies and audio_seconds else None,
+        'wer': float(np.mean(errors)) if errors else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='🎭 Improv AI - benchmark speech recognition backends on recorded phrases')
+    parser.add_argument('recordings', nargs='+', help='.wav files or folders of them (reference transcript in a .txt beside each)')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--vosk-model', help='Vosk model folder (default: $VOSK_MODEL or models/vosk)')
+    parser.add_argument('--whisper-model', help='faster-whisper model name or folder (default: $WHISPER_MODEL or base.en)')
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.recordings)
+    if not recordings:
+        print("❌ No .wav recordings found")
+        return
+    print(f"🎙️ {len(recordings)} phrase(s), {sum(r[2] for r in recordings):.1f}s of audio, "
+          f"{sum(r[3] is not None for r in recordings)} with reference transcripts")
+
+    models = {'vosk': args.vosk_model, 'whisper': args.whisper_model}
+    reports = {}
+    for name in args.backends:
+        print(f"\n🧪 {name}")
+        try:
+            backend = create_backend(name, model=models.get(name))
+        except RuntimeError as e:
+            print(f"   ⚠️ Skipped: {e}")
+            continue
+        reports[name] = benchmark(backend, recordings)
+
+    if not reports:
+        print("\n❌ No backend could run")
+        return
+    print("\n📊 Results")
+    for name, report in reports.items():
+        mean = f"{report['mean_ms']:.0f} ms" if report['mean_ms'] is not None else "-"
+        p95 = f"{report['p95_ms']:.0f} ms" if report['p95_ms'] is not None else "-"
+        rtf = f"{report['real_time_factor']:.2f}" if report['real_time_factor'] is not None else "-"
+        wer = f"{report['wer']:.1%}" if report['wer'] is not None else "-"
+        print(f"   {name:8} mean {mean:>8}  p95 {p95:>8}  RTF {rtf:>5}  WER {wer:>6}  failures {report['failures']}")
+
+if __name__ == "__main__":
+    main()
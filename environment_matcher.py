@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Local fuzzy matcher from utterances to library environments.
+
+Before any LLM call, the utterance is tokenized, expanded through a small
+synonym map and scored against every library environment name using token
+coverage, prefix matching and edit distance. When exactly one environment
+is a confident match it is used directly and the utterance never leaves
+the machine.
+
+A match on a single heard word ("park", "bar", "italian") is only trusted
+with location context: a spatial cue right before it ("at the park", "in
+this italian place") or other location keywords that aren't part of the
+name. "I'll park the car" and "I passed the bar exam" go to detection.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from keyword_engine import get_keyword_engine
+
+# Utterance word → library tokens it stands for
+SYNONYMS: Dict[str, List[str]] = {
+    'cafe': ['coffee', 'shop'], 'café': ['coffee', 'shop'], 'coffeehouse': ['coffee', 'shop'],
+    'starbucks': ['coffee', 'shop'], 'latte': ['coffee', 'shop'], 'cappuccino': ['coffee', 'shop'],
+    'espresso': ['coffee', 'shop'], 'barista': ['coffee', 'shop'],
+    'pub': ['bar'], 'tavern': ['bar'], 'saloon': ['bar'], 'bartender': ['bar'], 'cocktail': ['bar'],
+    'bistro': ['restaurant'], 'diner': ['restaurant'], 'eatery': ['restaurant'], 'trattoria': ['italian', 'restaurant'],
+    'pizzeria': ['italian', 'restaurant'], 'pasta': ['italian', 'restaurant'], 'spaghetti': ['italian', 'restaurant'],
+    'szechuan': ['chinese'], 'sichuan': ['chinese'], 'cantonese': ['chinese'], 'dim': ['chinese'],
+    'noodle': ['noodle'], 'noodles': ['noodle'],
+    'mcdonalds': ['fast', 'food'], "mcdonald's": ['fast', 'food'], 'burger': ['fast', 'food'],
+    'drive': ['fast', 'food'], 'kfc': ['fast', 'food'], 'wendys': ['fast', 'food'],
+    'supermarket': ['grocery', 'store'], 'groceries': ['grocery', 'store'], 'market': ['grocery', 'store'],
+    'garden': ['park'], 'playground': ['park'],
+    'rooftop': ['rooftop'], 'roof': ['rooftop'], 'skyscraper': ['skyscraper'],
+    'villain': ['evil', 'lair'], 'hideout': ['lair'], 'henchmen': ['evil', 'lair'],
+    'president': ['white', 'house'], 'oval': ['white', 'house', 'office'],
+    'berlin': ['brandenburg', 'gate'],
+    'chef': ['kitchen'], 'cooking': ['kitchen'], 'stove': ['kitchen'],
+}
+
+# Location cues before the matched word: "in paris", "at the old park", "to this italian place", "our kitchen"
+PREPOSITIONS = {'in', 'at', 'to', 'into', 'inside', 'outside', 'near', 'from', 'around'}
+DETERMINERS = {'the', 'a', 'an', 'this', 'these', 'our', 'my', 'your', 'their'}
+DEMONSTRATIVES = {'this', 'these', 'our'}
+FILLER_WORDS = 2  # Adjectives allowed between the determiner and the matched word
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+def edit_distance(a: str, b: str, limit: int = 2) -> int:
+    """Levenshtein distance, giving up early once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class LocalEnvironmentMatcher:
+    def __init__(self, library, min_coverage: float = 1.0):
+        self.library = library
+        self.min_coverage = min_coverage  # Fraction of an environment's words that must be heard
+        self._names: List[str] = []
+        self._name_tokens: Dict[str, List[str]] = {}
+        self._truncated_tokens = set()
+        self._cuisines = set(get_keyword_engine().keywords_in('cuisine'))
+
+    def _refresh(self):
+        names = self.library.names(include_aliases=True)
+        if names != self._names:
+            self._names = names
+            self._name_tokens = {name: [t for t in name.split('_') if t] for name in names}
+            # Library names are cut at 25 characters ("italian_restaurant_waterf")
+            self._truncated_tokens = {tokens[-1] for name, tokens in self._name_tokens.items()
+                                      if len(name) >= 25 and tokens}
+
+    def expand(self, speech_text: str) -> set:
+        """Utterance tokens plus synonym and cuisine expansions"""
+        tokens = set()
+        for word in tokenize(speech_text):
+            tokens.add(word)
+            if word.endswith('s') and len(word) > 3:
+                tokens.add(word[:-1])
+            tokens.update(SYNONYMS.get(word, []))
+            if word in self._cuisines:
+                tokens.add('restaurant')  # "this Italian place" → italian_restaurant
+        return tokens
+
+    def _token_matches(self, name_token: str, heard: set) -> bool:
+        if name_token in heard:
+            return True
+        for word in heard:
+            if name_token in self._truncated_tokens and word.startswith(name_token):
+                return True
+            # Misspelled proper names ("brandenberg"); short words must match exactly
+            if len(name_token) >= 7 and edit_distance(name_token, word, limit=1) <= 1:
+                return True
+        return False
+
+    def has_context(self, speech_text: str, environment_name: str) -> bool:
+        """Whether an utterance names environment_name as a place rather than just using one of its words"""
+        self._refresh()
+        name_tokens = set(self._name_tokens.get(environment_name) or environment_name.split('_'))
+        words = tokenize(speech_text)
+        naming = [i for i, word in enumerate(words) if self.expand(word) & name_tokens]
+        # Two of the name's own words heard verbatim ("coffee shop", "emergency room") are specific enough
+        if len(name_tokens & set(words)) >= 2:
+            return True
+        if any(self._location_cue(words, i) for i in naming):
+            return True
+        # Other keywords suggesting a location; another place would compete with the match rather than support it
+        keywords = get_keyword_engine()
+        support = {match.keyword for match in keywords.find(speech_text)
+                   if 'place' not in match.categories and not self.expand(match.keyword) & name_tokens}
+        return sum(keywords.keywords[keyword]['weight'] for keyword in support) >= keywords.threshold
+
+    @staticmethod
+    def _location_cue(words: List[str], i: int) -> bool:
+        # "to" right before a word is usually a verb ("to park the car"), so it needs a determiner
+        if i and words[i - 1] in PREPOSITIONS - {'to'}:
+            return True
+        for j in range(max(0, i - FILLER_WORDS - 1), i):
+            if words[j] in DEMONSTRATIVES or (words[j] in DETERMINERS and j and words[j - 1] in PREPOSITIONS):
+                return True
+        return False
+
+    def score(self, speech_text: str) -> List[Tuple[str, float]]:
+        """(environment, coverage) for every environment with any word heard, best first"""
+        self._refresh()
+        heard = self.expand(speech_text)
+        scored = []
+        for name, name_tokens in self._name_tokens.items():
+            if not name_tokens:
+                continue
+            covered = sum(1 for token in name_tokens if self._token_matches(token, heard))
+            if covered:
+                scored.append((name, covered / len(name_tokens)))
+        # Higher coverage first, then the more specific (longer) name
+        scored.sort(key=lambda item: (item[1], len(self._name_tokens[item[0]])), reverse=True)
+        return scored
+
+    def match(self, speech_text: str) -> Optional[Tuple[str, float]]:
+        """The single confident library match for an utterance, or None if unsure"""
+        confident = [(name, coverage) for name, coverage in self.score(speech_text) if coverage >= self.min_coverage]
+        if not confident:
+            return None
+
+        best_name = confident[0][0]
+        best_tokens = set(self._name_tokens[best_name])
+        # Another full match that isn't just a less specific version of the best one means ambiguity
+        for name, _ in confident[1:]:
+            if self.library.resolve(name) == self.library.resolve(best_name):
+                continue  # Alias of the same image
+            if not set(self._name_tokens[name]) <= best_tokens:
+                return None
+        return confident[0]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+"""
+Background generation worker pool.
+
+Every new-environment generation becomes a GenerationJob that moves through
+
+    queued → running → published
+                     ↘ shelved      (finished into the library, never shown)
+    queued → cancelled              (superseded before it started)
+    running → failed
+
+When a newer environment is detected, queued jobs are cancelled and running
+ones are demoted: the DALL-E call can't be interrupted, so it still finishes
+into the library (the spend isn't wasted) but is not sent to QLab.
+
+Finished images - published or not - are handed to prepare_image (the
+projector derivative renderer) on the worker thread, so a cue never waits
+for the resize.
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+class GenerationJob:
+    QUEUED = "queued"
+    RUNNING = "running"
+    PUBLISHED = "published"
+    SHELVED = "shelved"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+    _ids = itertools.count(1)
+
+    def __init__(self, speech_text: str, environment_name: str, prompt: Optional[str] = None, publish: bool = True):
+        self.id = next(self._ids)
+        self.speech_text = speech_text
+        self.environment_name = environment_name
+        self.prompt = prompt
+        self.publish = publish  # False once demoted - generate into the library only
+        self.state = self.QUEUED
+        self.image_path = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in (self.QUEUED, self.RUNNING)
+
+    @property
+    def generation_time(self) -> float:
+        if self.started_at and self.finished_at:
+            return self.finished_at - self.started_at
+        return 0.0
+
+    def __repr__(self):
+        return f"<GenerationJob #{self.id} {self.environment_name} {self.state}{'' if self.publish else ' (demoted)'}>"
+
+class GenerationWorkerPool:
+    def __init__(self, image_generator, max_workers: int = 2, history_size: int = 50,
+                 prepare_image: Optional[Callable[[str], str]] = None):
+        self.image_generator = image_generator
+        self.prepare_image = prepare_image  # Renders the projector-size copy of a finished image
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self.history_size = history_size
+        self.jobs: List[GenerationJob] = []
+        self._lock = threading.Lock()
+
+    def submit(self, speech_text: str, environment_name: str, prompt: Optional[str] = None,
+               publish: bool = True) -> GenerationJob:
+        """Queue a generation, reusing an active job for the same environment"""
+        with self._lock:
+            for job in self.jobs:
+                if job.is_active and job.environment_name == environment_name:
+                    if publish and not job.publish:
+                        job.publish = True
+                        print(f"⬆️ Promoting generation of {environment_name} back to publish")
+                    return job
+
+            job = GenerationJob(speech_text, environment_name, prompt, publish)
+            self.jobs.append(job)
+            self._trim_history()
+
+        if publish:
+            self.supersede(environment_name)
+
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def supersede(self, environment_name: str):
+        """A newer environment was detected - cancel or demote generations of other environments"""
+        with self._lock:
+            for job in self.jobs:
+                if not job.publish or job.environment_name == environment_name:
+                    continue
+                if job.state == GenerationJob.QUEUED and job.future and job.future.cancel():
+                    job.state = GenerationJob.CANCELLED
+                    job.finished_at = time.time()
+                    print(f"🗑️ Cancelled queued generation: {job.environment_name}")
+                elif job.state in (GenerationJob.QUEUED, GenerationJob.RUNNING):
+                    job.publish = False
+                    print(f"⬇️ Demoted generation of {job.environment_name} - will be shelved in the library")
+
+    def mark_published(self, job: GenerationJob):
+        with self._lock:
+            job.state = GenerationJob.PUBLISHED
+
+    def mark_shelved(self, job: GenerationJob):
+        with self._lock:
+            job.state = GenerationJob.SHELVED
+        print(f"📚 Shelved {job.environment_name} in the library (not published)")
+
+    def active_count(self) -> int:
+        """Jobs queued or running (publishing jobs count until they are sent to QLab)"""
+        with self._lock:
+            return sum(1 for job in self.jobs if job.is_active)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {state: 0 for state in (GenerationJob.QUEUED, GenerationJob.RUNNING, GenerationJob.PUBLISHED,
+                                             GenerationJob.SHELVED, GenerationJob.CANCELLED, GenerationJob.FAILED)}
+            for job in self.jobs:
+                counts[job.state] += 1
+            return counts
+
+    def shutdown(self):
+        with self._lock:
+            for job in self.jobs:
+                if job.state == GenerationJob.QUEUED and job.future and job.future.cancel():
+                    job.state = GenerationJob.CANCELLED
+        self.executor.shutdown(wait=False)
+
+    def _run(self, job: GenerationJob) -> GenerationJob:
+        with self._lock:
+            job.state = GenerationJob.RUNNING
+            job.started_at = time.time()
+
+        try:
+            image_path = self.image_generator.generate_environment(job.speech_text, job.environment_name, job.prompt)
+        except Exception as e:
+            print(f"❌ Generation of {job.environment_name} failed: {e}")
+            image_path = None
+
+        with self._lock:
+            job.finished_at = time.time()
+            job.image_path = image_path
+            if not image_path:
+                job.state = GenerationJob.FAILED
+                return job
+
+        if self.prepare_image:
+            try:
+                self.prepare_image(image_path)
+            except Exception as e:
+                print(f"⚠️ Could not prepare projector copy of {job.environment_name}: {e}")
+
+        # Publishing jobs stay running until the caller sends them to QLab
+        if not job.publish:
+            self.mark_shelved(job)
+        return job
+
+    def _trim_history(self):
+        finished = [job for job in self.jobs if not job.is_active]
+        excess = len(self.jobs) - self.history_size
+        for job in finished[:max(excess, 0)]:
+            self.jobs.remove(job)
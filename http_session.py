@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""
+Shared, pooled HTTP layer for Improv AI.
+
+One requests.Session (image downloads) and one OpenAI client per API key
+(chat, embedding and image calls) are shared by every AIImageGenerator, so
+TCP/TLS connections are reused across cues instead of being set up cold.
+warm_up() opens those connections at startup and keep_warm() stops them
+from idling out during long scenes.
+"""
+
+import threading
+from typing import Dict, Optional
+
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+IMAGE_CDN_URL = "https://oaidalleapiprodscus.blob.core.windows.net"  # Where DALL-E image URLs point
+
+# Timeouts in seconds
+CONNECT_TIMEOUT = 5
+DOWNLOAD_TIMEOUT = (CONNECT_TIMEOUT, 30)  # (connect, read) for image downloads
+API_TIMEOUT = openai.Timeout(90.0, connect=CONNECT_TIMEOUT)  # DALL-E 3 can take a while
+WARM_UP_TIMEOUT = openai.Timeout(10.0, connect=CONNECT_TIMEOUT)
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_openai_clients: Dict[str, openai.OpenAI] = {}
+_keep_warm_thread: Optional[threading.Thread] = None
+
+def get_session() -> requests.Session:
+    """Shared requests session with connection pooling and retries"""
+    global _session
+    with _lock:
+        if _session is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET", "HEAD")
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def get_openai_client(api_key: str) -> openai.OpenAI:
+    """Shared OpenAI client for an API key (its keep-alive connection pool is reused by every caller)"""
+    with _lock:
+        if api_key not in _openai_clients:
+            _openai_clients[api_key] = openai.OpenAI(
+                api_key=api_key,
+                timeout=API_TIMEOUT,
+                max_retries=2
+            )
+        return _openai_clients[api_key]
+
+def warm_up(quiet: bool = False):
+    """Open TLS connections to the OpenAI API and image CDN ahead of the first cue"""
+    with _lock:
+        clients = list(_openai_clients.values())
+    for client in clients:
+        try:
+            # Cheapest authenticated call - leaves a handshaken connection in the client's pool
+            client.with_options(timeout=WARM_UP_TIMEOUT, max_retries=0).models.list()
+        except Exception as e:
+            if not quiet:
+                print(f"⚠️ Could not pre-connect to OpenAI API: {e}")
+    try:
+        get_session().head(IMAGE_CDN_URL, timeout=DOWNLOAD_TIMEOUT)
+    except Exception as e:
+        if not quiet:
+            print(f"⚠️ Could not pre-connect to image CDN: {e}")
+
+def warm_up_in_background():
+    threading.Thread(target=warm_up, daemon=True).start()
+
+def keep_warm(interval: float = 60):
+    """Re-touch the pooled connections periodically so idle scenes don't pay a cold handshake"""
+    global _keep_warm_thread
+    if _keep_warm_thread and _keep_warm_thread.is_alive():
+        return
+
+    def _loop():
+        stop = threading.Event()
+        while not stop.wait(interval):
+            warm_up(quiet=True)
+
+    _keep_warm_thread = threading.Thread(target=_loop, daemon=True)
+    _keep_warm_thread.start()
@@ -1,37 +1,105 @@
-import openai
-import requests
-from PIL import Image
-import io
+import json
+from concurrent.futures import ThreadPoolExecutor
 import os
-from typing import Optional
+import re
+from typing import Optional, Sequence
 import time
+from http_session import get_openai_client, get_session, DOWNLOAD_TIMEOUT
+from image_ingest import ingest_b64, ingest_url, validate_in_background
+from library_manifest import LibraryManifest
+from semantic_index import HashingEmbeddingProvider, OpenAIEmbeddingProvider, SemanticLibraryIndex
+from environment_matcher import LocalEnvironmentMatcher
+from keyword_engine import get_keyword_engine
+from transcript_cache import TranscriptCache
+from library_quota import LibraryQuota
+from library_claims import LibraryClaims
+from location_gate import MODEL_FILENAME, DecisionLog, LocationGate
 
 class AIImageGenerator:
-    def __init__(self, api_key: str, fast_mode: bool = True):
-        self.client = openai.OpenAI(api_key=api_key)
+    # How speech is turned into {is_location, environment_name, prompt}
+    CLASSIFICATION_MODES = ("sequential", "fused", "speculative")
+    # Embedding provider for near-synonym library reuse
+    SEMANTIC_LOOKUP_MODES = ("openai", "local", "off")
+    
+    def __init__(self, api_key: str, fast_mode: bool = True, classification_mode: str = "sequential",
+                 speculative_prompt: bool = False, semantic_lookup: str = "openai",
+                 semantic_threshold: Optional[float] = None, local_matching: bool = True,
+                 cache_transcripts: bool = True, library_quota_mb: Optional[float] = None,
+                 location_gate: bool = True):
+        if classification_mode not in self.CLASSIFICATION_MODES:
+            raise ValueError(f"Unknown classification mode: {classification_mode}")
+        
+        self.client = get_openai_client(api_key)  # Shared, pooled client
         self.images_dir = "generated_images"
         self.fast_mode = fast_mode
+        self.classification_mode = classification_mode
+        self.speculative_prompt = speculative_prompt  # Also start prompt enhancement speculatively
+        self._speculation_pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix="speculative")
         os.makedirs(self.images_dir, exist_ok=True)
+        self.library = LibraryManifest(self.images_dir)  # In-memory index, persisted in library.db
+        self.claims = LibraryClaims(self.images_dir)  # Single-flight generation across instances sharing the library
+        self.semantic_index = self._build_semantic_index(semantic_lookup, semantic_threshold)
+        self.keywords = get_keyword_engine()  # Shared offline keyword matcher (keywords.json)
+        self.environment_matcher = LocalEnvironmentMatcher(self.library) if local_matching else None
+        # Trained local classifier answers clear YES/NO lines; LLM decisions are logged to train it
+        self.location_gate = LocationGate.load(os.path.join(self.images_dir, MODEL_FILENAME)) if location_gate else None
+        self.decision_log = DecisionLog(self.images_dir)
+        # Memoized classification results for repeated lines (memory + transcript_cache.db)
+        self.transcript_cache = TranscriptCache(self.images_dir) if cache_transcripts else None
+        # Disk budget for generated_images/ - least used environments are evicted past it
+        self.quota = LibraryQuota(self.library, int(library_quota_mb * 1024 * 1024)) if library_quota_mb else None
         self._show_library_stats()
     
+    def _build_semantic_index(self, mode: str, threshold: Optional[float]) -> Optional[SemanticLibraryIndex]:
+        if mode == "off":
+            return None
+        provider = OpenAIEmbeddingProvider(self.client) if mode == "openai" else HashingEmbeddingProvider()
+        try:
+            return SemanticLibraryIndex(self.library, provider, threshold=threshold)
+        except Exception as e:
+            print(f"⚠️ Semantic library lookup disabled: {e}")
+            return None
+    
     def _show_library_stats(self):
         """Show existing environment library stats"""
-        existing_files = [f for f in os.listdir(self.images_dir) if f.endswith('.png')]
+        existing_names = self.library.names()
         
-        if existing_files:
-            print(f"📚 Environment Library: {len(existing_files)} backgrounds available")
+        if existing_names:
+            print(f"📚 Environment Library: {len(existing_names)} backgrounds available")
             # Show a few examples
-            examples = sorted(existing_files)[:5]
-            for example in examples:
-                env_name = example.replace('.png', '').replace('_', ' ')
-                print(f"   • {env_name}")
-            if len(existing_files) > 5:
-                print(f"   ... and {len(existing_files) - 5} more")
+            for name in existing_names[:5]:
+                print(f"   • {name.replace('_', ' ')}")
+            if len(existing_names) > 5:
+                print(f"   ... and {len(existing_names) - 5} more")
         else:
             print("📚 Environment Library: Empty (will build as you perform)")
     
+    def _cached(self, namespace: str, speech_text: str):
+        if self.transcript_cache is None:
+            return None
+        return self.transcript_cache.get(namespace, speech_text)
+    
+    def _cache(self, namespace: str, speech_text: str, result):
+        if self.transcript_cache is not None:
+            self.transcript_cache.put(namespace, speech_text, result)
+    
+    def _gate(self, speech_text: str, local_yes: bool = True) -> Optional[bool]:
+        """Local classifier's answer, or None when the line needs the LLM"""
+        if not self.location_gate:
+            return None
+        decision = self.location_gate.decide(speech_text, local_yes)
+        if decision is not None:
+            print(f"🧮 Local gate: {'YES' if decision else 'NO'}")
+        return decision
+    
     def detect_location_context(self, speech_text: str) -> bool:
         """Check if speech contains location/setting information worth visualizing"""
+        cached = self._cached('detect', speech_text)
+        if cached is not None:
+            return cached
+        gated = self._gate(speech_text)
+        if gated is not None:
+            return gated
         try:
             response = self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
@@ -64,39 +132,14 @@ class AIImageGenerator:
             )
             
             result = response.choices[0].message.content.strip().upper()
-            return result == "YES"
+            is_location = result == "YES"
+            self._cache('detect', speech_text, is_location)
+            self.decision_log.record(speech_text, is_location, 'detect')
+            return is_location
             
         except Exception as e:
             print(f"Location detection error: {e}")
-            # Fallback: check for location/profession/activity keywords
-            location_keywords = [
-                # Explicit locations
-                'park', 'restaurant', 'forest', 'beach', 'office', 'room', 'house', 'store', 'cafe', 'bar', 
-                'school', 'hospital', 'airport', 'station', 'street', 'outside', 'inside', 'kitchen', 'bathroom',
-                # Professions that imply settings
-                'doctor', 'nurse', 'teacher', 'chef', 'pilot', 'farmer', 'lawyer', 'judge', 'mechanic', 'scientist',
-                'barista', 'waiter', 'waitress', 'server',
-                # Activities that imply settings  
-                'surgery', 'operation', 'cooking', 'baking', 'swimming', 'driving', 'flying', 'sailing', 'hiking',
-                'ordering', 'menu', 'bill', 'check', 'meeting', 'conference', 'presentation', 'interview',
-                'basketball', 'tennis', 'football', 'soccer', 'baseball', 'gym', 'workout', 'exercise', 'sports',
-                # Food/drink items that imply restaurants/cafes
-                'cappuccino', 'latte', 'espresso', 'coffee', 'tea', 'wine', 'beer', 'cocktail', 'burger', 'pizza',
-                'sandwich', 'salad', 'pasta', 'steak', 'dessert', 'appetizer', 'falafel', 'shawarma', 'kebab',
-                'tacos', 'burritos', 'sushi', 'ramen', 'noodles', 'soup', 'bread', 'bakery', 'croissant',
-                # Common restaurant/chain names
-                'starbucks', 'mcdonalds', "mcdonald's", 'subway', 'chipotle', 'taco bell', 'kfc', 'burger king',
-                'olive garden', 'applebees', "applebee's", 'chilis', "chili's", 'dennys', "denny's", 'ihop',
-                'pizza hut', 'dominos', "domino's", 'papa johns', "papa john's", 'wendy\'s', 'wendys',
-                # Generic restaurant types
-                'sushi', 'chinese', 'italian', 'mexican', 'thai', 'indian', 'french', 'steakhouse', 'diner',
-                'bistro', 'pizzeria', 'bakery', 'delicatessen', 'drive-through', 'drive thru', 'fast food',
-                # Weather/environmental contexts
-                'storm', 'rain', 'snow', 'sunny', 'cloudy', 'thunder', 'lightning', 'fog', 'wind', 'sunset', 'sunrise',
-                # Situational contexts
-                'courtroom', 'classroom', 'cockpit', 'farm', 'laboratory', 'garage', 'workshop', 'stage', 'theater'
-            ]
-            return any(keyword in speech_text.lower() for keyword in location_keywords)
+            return self._keyword_location_fallback(speech_text)
     
     def enhance_prompt_for_background(self, speech_text: str) -> str:
         """Convert speech to optimized background image prompt"""
@@ -134,8 +177,7 @@ class AIImageGenerator:
             )
             
             enhanced_prompt = response.choices[0].message.content.strip()
-            # Add intimate styling without theater references
-            final_prompt = f"{enhanced_prompt}, close-up view, human scale, cozy atmosphere, warm natural lighting, simple background, conversation-friendly space"
+            final_prompt = self._style_prompt(enhanced_prompt)
             
             print(f"Enhanced prompt: {final_prompt}")
             return final_prompt
@@ -145,8 +187,112 @@ class AIImageGenerator:
             # Fallback to basic enhancement
             return f"Location scene: {speech_text}, natural lighting, realistic view, everyday setting"
     
+    def _style_prompt(self, enhanced_prompt: str) -> str:
+        """Add intimate styling without theater references"""
+        return f"{enhanced_prompt}, close-up view, human scale, cozy atmosphere, warm natural lighting, simple background, conversation-friendly space"
+    
+    def fused_classify(self, speech_text: str) -> dict:
+        """Detect location, name the environment and write the image prompt in one request"""
+        cached = self._cached('fused', speech_text)
+        if cached is not None:
+            if cached['is_location']:
+                print(f"💾 Cached environment: '{cached['environment_name']}'")
+            return cached
+        # A local YES would still need the LLM for the name and prompt, so only NO is answered here
+        if self._gate(speech_text, local_yes=False) is False:
+            # Clearly not a location - no need for the name and prompt either
+            return {'is_location': False, 'environment_name': '', 'prompt': None}
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                response_format={"type": "json_object"},
+                messages=[
+                    {
+                        "role": "system",
+                        "content": """You turn improv dialogue into theater background cues. Respond with a JSON object:
+                        {"is_location": true/false, "environment_name": "...", "prompt": "..."}
+                        
+                        is_location: true if the speech mentions or IMPLIES a SPECIFIC LOCATION, SETTING, or ENVIRONMENT
+                        that would make a good theater background - explicit places, professions (doctor → hospital),
+                        activities (surgery → operating room), food/drinks (latte → cafe), restaurant names or types,
+                        weather (storm, sunset) or situations (courtroom, spaceship, castle).
+                        false for general conversation, greetings, emotions without clear setting context.
+                        
+                        environment_name: 1-3 lowercase words separated by underscores naming a REUSABLE library
+                        environment. Include cuisine/style for restaurants and key descriptors for unique places.
+                        Examples: "Szechuan noodle place" → "chinese_restaurant", "let's get coffee" → "coffee_shop",
+                        "thanks for coming to this meeting" → "office", "we're in a dark forest" → "dark_forest".
+                        
+                        prompt: under 60 words describing an INTIMATE, human-scale view of the location, as if standing
+                        in it during a two-person scene. No wide vistas, aerial views or crowds.
+                        
+                        When is_location is false, environment_name and prompt are empty strings."""
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Speech: '{speech_text}'"
+                    }
+                ],
+                max_tokens=200,
+                temperature=0.3
+            )
+            
+            result = json.loads(response.choices[0].message.content)
+            is_location = result.get('is_location')
+            if isinstance(is_location, str):
+                is_location = is_location.strip().upper() in ("YES", "TRUE")
+            
+            environment_name = self._clean_environment_name(str(result.get('environment_name') or ''))
+            prompt = str(result.get('prompt') or '').strip()
+            
+            if is_location and not environment_name:
+                raise ValueError("missing environment_name")
+            
+            if is_location:
+                print(f"🏗️ Environment extracted: '{environment_name}'")
+            result = {
+                'is_location': bool(is_location),
+                'environment_name': environment_name,
+                'prompt': self._style_prompt(prompt) if prompt else None
+            }
+            self._cache('fused', speech_text, result)
+            self.decision_log.record(speech_text, result['is_location'], 'fused')
+            return result
+            
+        except Exception as e:
+            print(f"Fused classification error: {e}")
+            # Fallback: keyword detection and naming, prompt is enhanced later
+            is_location = self._keyword_location_fallback(speech_text)
+            return {
+                'is_location': is_location,
+                'environment_name': self._keyword_environment_fallback(speech_text) if is_location else '',
+                'prompt': None
+            }
+    
+    def match_locally(self, speech_text: str) -> Optional[str]:
+        """Confident library environment for an utterance without any API call, or None"""
+        if not self.environment_matcher:
+            return None
+        match = self.environment_matcher.match(speech_text)
+        if not match:
+            return None
+        environment_name = match[0]
+        # "I'll park the car" names no park - without location context the detector decides
+        if not self.environment_matcher.has_context(speech_text, environment_name):
+            print(f"🤔 '{environment_name}' heard without location context - checking further")
+            return None
+        print(f"🏠 Local match: '{environment_name}'")
+        return environment_name
+    
     def _extract_environment_name(self, speech_text: str) -> str:
         """Extract the core environment/location for reusable library naming"""
+        local_match = self.match_locally(speech_text)
+        if local_match:
+            return local_match
+        cached = self._cached('extract', speech_text)
+        if cached is not None:
+            print(f"💾 Cached environment: '{cached}'")
+            return cached
         try:
             # Use AI to extract the core environment concept
             response = self.client.chat.completions.create(
@@ -194,98 +340,214 @@ class AIImageGenerator:
             environment = response.choices[0].message.content.strip()
             
             # Clean up the response
-            import re
-            environment = re.sub(r'[^a-zA-Z0-9_]', '_', environment.lower())
-            environment = re.sub(r'_+', '_', environment)  # Remove multiple underscores
-            environment = environment.strip('_')  # Remove leading/trailing underscores
-            environment = environment[:25]  # Limit length
+            environment = self._clean_environment_name(environment)
             
             print(f"🏗️ Environment extracted: '{environment}'")
+            if environment:
+                self._cache('extract', speech_text, environment)
             return environment
             
         except Exception as e:
             print(f"Environment extraction error: {e}")
-            # Fallback: simple keyword extraction
-            import re
-            words = speech_text.lower().split()
-            
-            # Key location words that should be preserved with cuisine/style types
-            location_words = ['park', 'beach', 'forest', 'office', 'hospital', 'cafe', 'coffee', 
-                            'shop', 'store', 'street', 'city', 'london', 'paris', 'giza', 'pyramids',
-                            'kitchen', 'bedroom', 'bathroom', 'garage', 'basement', 'attic',
-                            'school', 'classroom', 'library', 'airport', 'station', 'hotel',
-                            # Restaurant/cuisine types
-                            'italian', 'chinese', 'mexican', 'thai', 'indian', 'french', 'japanese',
-                            'korean', 'vietnamese', 'greek', 'middle_eastern', 'mediterranean', 
-                            'steakhouse', 'bistro', 'pizzeria', 'sushi', 'diner', 'fast_food',
-                            # Descriptive modifiers
-                            'fancy', 'upscale', 'casual', 'dark', 'bright', 'modern', 'old', 'vintage']
-            
-            found_words = [word for word in words if word in location_words]
+            return self._keyword_environment_fallback(speech_text)
+    
+    def choose_transcript(self, alternatives: Sequence[str]) -> str:
+        """The recognizer hypothesis that most clearly names a location - the top one unless another is stronger"""
+        def evidence(text: str) -> tuple:
+            in_library = bool(self.environment_matcher and self.environment_matcher.match(text))
+            return (in_library, self.keywords.score(text))
+        
+        best = max(range(len(alternatives)), key=lambda i: (evidence(alternatives[i]), -i))
+        if best:
+            print(f"🔀 Using alternative {best + 1}/{len(alternatives)}: '{alternatives[best]}'")
+        return alternatives[best]
+    
+    def has_location_keywords(self, speech_text: str) -> bool:
+        """Cheap local check used to prioritize utterances before any API call"""
+        return self._keyword_location_fallback(speech_text)
+    
+    def _keyword_location_fallback(self, speech_text: str) -> bool:
+        """Offline location check: weighted location/profession/activity keywords"""
+        return self.keywords.is_location(speech_text)
+    
+    def _clean_environment_name(self, environment: str) -> str:
+        """Normalize an environment name into a safe library filename"""
+        environment = re.sub(r'[^a-zA-Z0-9_]', '_', environment.lower())
+        environment = re.sub(r'_+', '_', environment)  # Remove multiple underscores
+        environment = environment.strip('_')  # Remove leading/trailing underscores
+        return environment[:25]  # Limit length
+    
+    def _keyword_environment_fallback(self, speech_text: str) -> str:
+        """Offline environment naming: simple keyword extraction"""
+        matches = self.keywords.naming_words(speech_text)
+        found_words = [match.keyword.replace(' ', '_') for match in matches]
+        
+        if found_words:
+            # Smart combination: cuisine + restaurant, descriptors + locations
+            cuisines = [word for word, match in zip(found_words, matches) if 'cuisine' in match.categories]
+            descriptive = [word for word, match in zip(found_words, matches) if 'descriptor' in match.categories]
+            locations = [word for word in found_words if word not in cuisines and word not in descriptive]
             
-            if found_words:
-                # Smart combination: cuisine + restaurant, descriptors + locations
-                cuisine_types = ['italian', 'chinese', 'mexican', 'thai', 'indian', 'french', 'japanese',
-                               'korean', 'vietnamese', 'greek', 'middle_eastern', 'mediterranean']
-                descriptors = ['fancy', 'upscale', 'casual', 'dark', 'bright', 'modern', 'old', 'vintage']
-                
-                cuisines = [w for w in found_words if w in cuisine_types]
-                descriptive = [w for w in found_words if w in descriptors]
-                locations = [w for w in found_words if w not in cuisine_types and w not in descriptors]
-                
-                # Build intelligent name
-                name_parts = []
-                if descriptive and cuisines:
-                    name_parts = [descriptive[0], cuisines[0], 'restaurant']
-                elif cuisines:
-                    name_parts = [cuisines[0], 'restaurant']
-                elif descriptive and locations:
-                    name_parts = [descriptive[0]] + locations[:1]
-                else:
-                    name_parts = found_words[:2]
-                
-                return '_'.join(name_parts)
+            # Build intelligent name
+            name_parts = []
+            if descriptive and cuisines:
+                name_parts = [descriptive[0], cuisines[0], 'restaurant']
+            elif cuisines:
+                name_parts = [cuisines[0], 'restaurant']
+            elif descriptive and locations:
+                name_parts = [descriptive[0]] + locations[:1]
             else:
-                return "generic_location"
+                name_parts = found_words[:2]
+            
+            return '_'.join(name_parts)
+        else:
+            return "generic_location"
     
-    def generate_background_image(self, speech_text: str, min_interval: float = 15, time_since_last: float = 0) -> Optional[tuple]:
-        """Generate background image from speech text"""
-        try:
-            # First check if this speech contains location context
-            if not self.detect_location_context(speech_text):
+    def classify_speech(self, speech_text: str) -> Optional[dict]:
+        """Detect location context and extract the library environment name"""
+        # Clear library match - no detection, extraction or prompt call needed
+        local_match = self.match_locally(speech_text)
+        if local_match:
+            return {'environment_name': local_match, 'prompt': None}
+        
+        if self.classification_mode == "fused":
+            result = self.fused_classify(speech_text)
+            if not result['is_location']:
                 print(f"🚫 No location context detected in: '{speech_text}' - skipping image generation")
                 return None
-            
             print(f"📍 Location detected - checking library for: '{speech_text}'")
-            
-            # Extract environment name for library check
-            environment_name = self._extract_environment_name(speech_text)
-            filename = f"{environment_name}.png"
-            filepath = os.path.join(self.images_dir, filename)
-            
-            # Check if environment already exists in library
-            if os.path.exists(filepath):
-                print(f"📚 Found existing environment: {environment_name}")
-                print(f"♻️ Reusing: {filepath}")
-                return (filepath, True)  # Return tuple: (path, was_reused)
-            
-            # Check rate limiting for new generation
-            if time_since_last < min_interval:
-                print(f"🕐 Rate limited - waiting {min_interval - time_since_last:.1f}s before generating new image")
-                return None
-            
+            return {'environment_name': result['environment_name'], 'prompt': result['prompt']}
+        
+        if self.classification_mode == "speculative":
+            return self._speculative_classify(speech_text)
+        
+        if not self.detect_location_context(speech_text):
+            print(f"🚫 No location context detected in: '{speech_text}' - skipping image generation")
+            return None
+        
+        print(f"📍 Location detected - checking library for: '{speech_text}'")
+        
+        # Extract environment name for library check
+        environment_name = self._extract_environment_name(speech_text)
+        return {'environment_name': environment_name, 'prompt': None}
+    
+    def _speculative_classify(self, speech_text: str) -> Optional[dict]:
+        """Run detection and extraction (and optionally prompt enhancement) at the same time"""
+        detect_future = self._speculation_pool.submit(self.detect_location_context, speech_text)
+        extract_future = self._speculation_pool.submit(self._extract_environment_name, speech_text)
+        prompt_future = None
+        if self.speculative_prompt:
+            prompt_future = self._speculation_pool.submit(self.enhance_prompt_for_background, speech_text)
+        
+        if not detect_future.result():
+            # Losing branches: cancel if not started yet, otherwise their results are discarded
+            extract_future.cancel()
+            if prompt_future:
+                prompt_future.cancel()
+            print(f"🚫 No location context detected in: '{speech_text}' - skipping image generation")
+            return None
+        
+        print(f"📍 Location detected - checking library for: '{speech_text}'")
+        environment_name = extract_future.result()
+        
+        prompt = None
+        if prompt_future:
+            if self.has_environment(environment_name):
+                # Library hit - the speculative prompt is not needed
+                prompt_future.cancel()
+            else:
+                prompt = prompt_future.result()
+        
+        return {'environment_name': environment_name, 'prompt': prompt}
+    
+    def library_path(self, environment_name: str) -> str:
+        """Path of an environment's image in the library"""
+        return os.path.join(self.images_dir, f"{environment_name}.png")
+    
+    def has_environment(self, environment_name: str) -> bool:
+        return environment_name in self.library
+    
+    def find_in_library(self, environment_name: str) -> Optional[str]:
+        """Return the library image for an environment, if it exists"""
+        entry = self.library.get(environment_name)
+        if not entry and self.semantic_index:
+            # Near-synonym of something we already have?
+            match = self.semantic_index.best_match(environment_name)
+            if match:
+                print(f"🧭 Semantic match: '{environment_name}' → '{match[0]}' (similarity {match[1]:.2f})")
+                environment_name = match[0]
+                entry = self.library.get(environment_name)
+        if not entry:
+            return None
+        if entry['name'] != environment_name:
+            print(f"🔗 Alias: '{environment_name}' → '{entry['name']}'")
+            environment_name = entry['name']
+        
+        filepath = entry['path']
+        if not os.path.exists(filepath):
+            # Deleted behind our back - forget it so it gets regenerated
+            self.library.remove(environment_name)
+            if self.semantic_index:
+                self.semantic_index.remove(environment_name)
+            return None
+        
+        self.library.record_use(environment_name)
+        print(f"📚 Found existing environment: {environment_name}")
+        print(f"♻️ Reusing: {filepath}")
+        return filepath
+    
+    def enforce_quota(self, protect=()):
+        """Evict least used environments if the library is over its disk quota"""
+        if not self.quota:
+            return
+        for name in self.quota.enforce(protect):
+            if self.semantic_index:
+                self.semantic_index.remove(name)
+    
+    def _finished_elsewhere(self, environment_name: str) -> Optional[str]:
+        """Image another instance (or thread) finished for this environment, if any"""
+        entry = self.library.refresh(environment_name)
+        if entry and os.path.exists(entry['path']):
+            print(f"🤝 Environment generated by another instance: {environment_name}")
+            return entry['path']
+        return None
+    
+    def generate_environment(self, speech_text: str, environment_name: str, prompt: Optional[str] = None) -> Optional[str]:
+        """Generate a new environment image, unless a concurrent generation of it is already running"""
+        while not self.claims.try_claim(environment_name):
+            print(f"⏳ '{environment_name}' is already being generated - waiting for it")
+            self.claims.wait(environment_name)
+            existing_path = self._finished_elsewhere(environment_name)
+            if existing_path:
+                return existing_path
+            # The other generation failed - try to claim it ourselves
+        
+        try:
+            # It may have finished between the library check and our claim
+            return self._finished_elsewhere(environment_name) or \
+                self._generate_claimed(speech_text, environment_name, prompt)
+        finally:
+            self.claims.release(environment_name)
+    
+    def _generate_claimed(self, speech_text: str, environment_name: str, prompt: Optional[str] = None) -> Optional[str]:
+        """Generate a new environment image and save it to the library"""
+        filepath = self.library_path(environment_name)
+        
+        try:
             print(f"🎨 Generating new environment: {environment_name}")
             
-            # Enhance the prompt
-            enhanced_prompt = self.enhance_prompt_for_background(speech_text)
+            # Enhance the prompt (unless the classifier already produced one)
+            enhanced_prompt = prompt or self.enhance_prompt_for_background(speech_text)
             
             # Generate image - use faster settings for live performance
+            model = "dall-e-2" if self.fast_mode else "dall-e-3"
             if self.fast_mode:
                 # DALL-E 2: Much faster, good enough quality for live shows
                 response = self.client.images.generate(
                     model="dall-e-2",
                     prompt=enhanced_prompt,
                     size="1024x1024",  # DALL-E 2 doesn't support wide format
+                    response_format="b64_json",  # Image bytes inline - no second download
                     n=1
                 )
             else:
@@ -295,23 +557,53 @@ class AIImageGenerator:
                     prompt=enhanced_prompt,
                     size="1792x1024",  # Wide format for theater backdrop
                     quality="standard",
+                    response_format="b64_json",
                     n=1
                 )
             
-            # Download and save image
-            image_url = response.data[0].url
-            image_response = requests.get(image_url)
+            # Save straight to the library (atomic rename, validated off the hot path)
+            image_data = response.data[0]
+            if image_data.b64_json:
+                ingest_b64(image_data.b64_json, filepath, validate=False)
+            else:
+                ingest_url(image_data.url, filepath, get_session(), DOWNLOAD_TIMEOUT, validate=False)
+            self.library.add(environment_name, filepath, prompt=enhanced_prompt, model=model)
+            if self.semantic_index:
+                self.semantic_index.add(environment_name)
+            validate_in_background(filepath, on_invalid=lambda path: self.library.remove(environment_name))
             
-            if image_response.status_code == 200:
-                # Save image (environment_name and filepath already determined above)
-                image = Image.open(io.BytesIO(image_response.content))
-                image.save(filepath)
+            print(f"📚 Environment saved to library: {filepath}")
+            self.enforce_quota(protect=[environment_name])
+            return filepath
                 
-                print(f"📚 Environment saved to library: {filepath}")
-                return (filepath, False)  # Return tuple: (path, was_reused=False for new generation)
-            else:
-                print("Failed to download generated image")
+        except Exception as e:
+            print(f"Error generating image: {e}")
+            return None
+    
+    def generate_background_image(self, speech_text: str, min_interval: float = 15, time_since_last: float = 0) -> Optional[tuple]:
+        """Generate background image from speech text"""
+        try:
+            # First check if this speech contains location context
+            classification = self.classify_speech(speech_text)
+            if not classification:
                 return None
+            
+            environment_name = classification['environment_name']
+            
+            # Check if environment already exists in library
+            existing_path = self.find_in_library(environment_name)
+            if existing_path:
+                return (existing_path, True)  # Return tuple: (path, was_reused)
+            
+            # Check rate limiting for new generation
+            if time_since_last < min_interval:
+                print(f"🕐 Rate limited - waiting {min_interval - time_since_last:.1f}s before generating new image")
+                return None
+            
+            filepath = self.generate_environment(speech_text, environment_name, classification.get('prompt'))
+            if filepath:
+                return (filepath, False)  # Return tuple: (path, was_reused=False for new generation)
+            return None
                 
         except Exception as e:
             print(f"Error generating image: {e}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""
+Direct-to-disk ingestion of generated images into the library.
+
+Image bytes (a b64_json API payload or a streamed download) are written to
+a temporary file next to the target and atomically renamed into place, with
+no PIL decode/re-encode on the hot path. Full image validation happens
+afterwards on a background thread.
+"""
+
+import base64
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from PIL import Image
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+CHUNK_SIZE = 64 * 1024
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_validator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-validate")
+
+def write_atomic(filepath: str, chunks: Iterable[bytes]) -> str:
+    """Write chunks to a temp file beside filepath, then rename it into place"""
+    directory = os.path.dirname(filepath) or "."
+    # Unique per call - two threads may write the same file (derivative warm-up and a cue)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(filepath)}.", suffix=".part")
+    try:
+        os.chmod(tmp_path, 0o666 & ~_UMASK)  # mkstemp creates 0600; keep the usual file permissions
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return filepath
+
+def _check_signature(first_chunk: bytes):
+    """Cheap sanity check - the full decode happens in validate_in_background"""
+    if not first_chunk.startswith(PNG_SIGNATURE):
+        raise ValueError("downloaded data is not a PNG image")
+
+def ingest_b64(b64_data: str, filepath: str, validate: bool = True) -> str:
+    """Save a b64_json image payload to the library (no second HTTP fetch)"""
+    data = base64.b64decode(b64_data)
+    _check_signature(data[:len(PNG_SIGNATURE)])
+    write_atomic(filepath, [data])
+    if validate:
+        validate_in_background(filepath)
+    return filepath
+
+def ingest_url(url: str, filepath: str, session, timeout, validate: bool = True) -> str:
+    """Stream an image download straight into the library"""
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+
+        def checked_chunks():
+            first = True
+            for chunk in chunks:
+                if first and chunk:
+                    _check_signature(chunk)
+                    first = False
+                yield chunk
+
+        write_atomic(filepath, checked_chunks())
+    if validate:
+        validate_in_background(filepath)
+    return filepath
+
+def validate_image(filepath: str, on_invalid: Optional[Callable[[str], None]] = None) -> bool:
+    """Fully decode-check an image, moving it aside if it is corrupt"""
+    try:
+        with Image.open(filepath) as image:
+            image.verify()
+        return True
+    except Exception as e:
+        print(f"⚠️ Library image failed validation ({e}): {filepath}")
+        if os.path.exists(filepath):
+            os.replace(filepath, f"{filepath}.corrupt")
+        if on_invalid:
+            on_invalid(filepath)
+        return False
+
+def validate_in_background(filepath: str, on_invalid: Optional[Callable[[str], None]] = None):
+    _validator.submit(validate_image, filepath, on_invalid)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+"""
+Shared keyword engine for offline location detection and naming.
+
+All keywords from keywords.json are compiled into one regular expression
+(longest alternatives first) with word-boundary semantics, so a whole
+utterance is scanned in a single pass and "bar" no longer matches "barely"
+nor "tea" "team". Every keyword carries its categories (place, cuisine,
+food, ...) and a weight; an utterance counts as naming a location when the
+weights of the distinct keywords it contains reach the threshold.
+
+The same engine backs the location fallback and keyword naming in
+AIImageGenerator and the restaurant rule in sound_mappings.json.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keywords.json")
+
+class KeywordMatch(NamedTuple):
+    keyword: str
+    categories: Tuple[str, ...]
+    weight: float
+    start: int
+    end: int
+
+def _normalize(phrase: str) -> str:
+    """Canonical form shared by keywords and matched text: lowercase, words separated by single spaces"""
+    return re.sub(r"[\s_\-]+", " ", phrase.strip().lower())
+
+class KeywordEngine:
+    def __init__(self, data: dict):
+        self.threshold = float(data.get('threshold', 1.0))
+        self.naming_categories: Set[str] = set()
+        self.keywords: Dict[str, dict] = {}  # normalized keyword -> {'categories', 'weight'}
+
+        for category, spec in data['categories'].items():
+            if spec.get('naming'):
+                self.naming_categories.add(category)
+            for keyword in spec['keywords']:
+                info = self.keywords.setdefault(_normalize(keyword), {'categories': [], 'weight': 0.0})
+                if category not in info['categories']:
+                    info['categories'].append(category)
+                info['weight'] = max(info['weight'], float(spec.get('weight', 1.0)))
+
+        # Multi-word keywords also match "fast-food" and "fast_food"; plurals/possessives are allowed
+        alternatives = sorted(self.keywords, key=len, reverse=True)
+        body = "|".join(r"[\s_\-]+".join(re.escape(word) for word in keyword.split(" ")) for keyword in alternatives)
+        self.pattern = re.compile(rf"(?<![a-z0-9])({body})(?:'s|s|es)?(?![a-z0-9])", re.IGNORECASE)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_PATH) -> "KeywordEngine":
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def find(self, text: str) -> List[KeywordMatch]:
+        """Every keyword occurrence, in order"""
+        matches = []
+        for match in self.pattern.finditer(text):
+            keyword = _normalize(match.group(1))
+            info = self.keywords[keyword]
+            matches.append(KeywordMatch(keyword, tuple(info['categories']), info['weight'], match.start(), match.end()))
+        return matches
+
+    def score(self, text: str) -> float:
+        """Summed weight of the distinct keywords in text"""
+        return sum(self.keywords[keyword]['weight'] for keyword in {match.keyword for match in self.find(text)})
+
+    def is_location(self, text: str) -> bool:
+        return self.score(text) >= self.threshold
+
+    def categories(self, text: str) -> Set[str]:
+        return {category for match in self.find(text) for category in match.categories}
+
+    def has_category(self, text: str, *categories: str) -> bool:
+        return bool(self.categories(text).intersection(categories))
+
+    def naming_words(self, text: str) -> List[KeywordMatch]:
+        """Keywords usable in an environment name, in spoken order"""
+        return [match for match in self.find(text) if self.naming_categories.intersection(match.categories)]
+
+    def keywords_in(self, *categories: str) -> List[str]:
+        return sorted(keyword for keyword, info in self.keywords.items()
+                      if set(info['categories']).intersection(categories))
+
+_default_engine: Optional[KeywordEngine] = None
+_default_lock = threading.Lock()
+
+def get_keyword_engine() -> KeywordEngine:
+    """Process-wide engine loaded from keywords.json"""
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = KeywordEngine.from_file()
+        return _default_engine
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Cross-process coordination for a shared generated_images/ directory.
+
+Several Improv AI instances (one per stage) can share one library. Before
+generating an environment an instance claims it by atomically creating
+generated_images/.claims/<name>.claim (O_CREAT | O_EXCL). Anyone else who
+wants the same environment waits for the claim to be released and then
+reuses the finished image instead of generating it again (single-flight).
+Claims left by crashed instances are taken over once their owner process is
+gone or the claim is older than its TTL; that check-and-steal step runs
+under an exclusive lock on generated_images/.library.lock.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CLAIMS_DIR = ".claims"
+LOCK_FILENAME = ".library.lock"
+
+_thread_lock = threading.Lock()
+
+@contextmanager
+def library_lock(images_dir: str):
+    """Exclusive lock shared by every process (and thread) using images_dir"""
+    path = os.path.join(images_dir, LOCK_FILENAME)
+    with _thread_lock:
+        with open(path, 'a+') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists but belongs to someone else
+    return True
+
+class LibraryClaims:
+    def __init__(self, images_dir: str = "generated_images", ttl: float = 180.0, poll_interval: float = 0.5):
+        self.images_dir = images_dir
+        self.claims_dir = os.path.join(images_dir, CLAIMS_DIR)
+        self.ttl = ttl  # Longest a generation may hold a claim (DALL-E 3 can take ~60s)
+        self.poll_interval = poll_interval
+        self.host = socket.gethostname()
+        os.makedirs(self.claims_dir, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.claims_dir, f"{name}.claim")
+
+    def _read(self, name: str):
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _is_stale(self, name: str) -> bool:
+        try:
+            age = time.time() - os.path.getmtime(self._path(name))
+        except OSError:
+            return False  # Already released
+        if age > self.ttl:
+            return True
+        claim = self._read(name)
+        if claim and claim.get('host') == self.host:
+            return not _process_alive(claim.get('pid', 0))
+        return False
+
+    def try_claim(self, name: str) -> bool:
+        """Claim an environment for generation; False if another generation holds it"""
+        try:
+            fd = os.open(self._path(name), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            with library_lock(self.images_dir):
+                if not self._is_stale(name):
+                    return False
+                print(f"🧹 Taking over stale claim on '{name}'")
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+                try:
+                    fd = os.open(self._path(name), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'host': self.host, 'pid': os.getpid(), 'thread': threading.get_ident(),
+                       'claimed_at': time.time()}, f)
+        return True
+
+    def release(self, name: str):
+        claim = self._read(name)
+        if claim and (claim.get('host'), claim.get('pid')) != (self.host, os.getpid()):
+            return  # Taken over by someone else after we went stale
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def wait(self, name: str, timeout: float = None) -> bool:
+        """Block until the claim on name is released (or goes stale); False on timeout"""
+        deadline = time.time() + (timeout if timeout is not None else self.ttl)
+        while os.path.exists(self._path(name)):
+            if self._is_stale(name):
+                return True
+            if time.time() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+"""
+Perceptual-hash deduplication of the environment library.
+
+Every library image gets a 64-bit DCT perceptual hash (resized to 32x32
+grayscale, 2D DCT done as one batched NumPy matrix product over the whole
+library, top-left 8x8 block thresholded at its median). Pairwise Hamming
+distances are computed in one vectorized step and images within the
+threshold are clustered. Each cluster is merged into its most used entry;
+the other names become aliases in the manifest and their files are removed.
+
+Hashes are cached in generated_images/phashes.npz keyed by file size and
+mtime, so only new or changed images are decoded.
+"""
+
+import os
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+CACHE_FILENAME = "phashes.npz"
+HASH_SIZE = 8       # 8x8 low-frequency block -> 64-bit hash
+SAMPLE_SIZE = 32    # Images are reduced to 32x32 before the DCT
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II basis"""
+    k = np.arange(size)[:, None]
+    i = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+def _load_sample(filepath: str) -> np.ndarray:
+    with Image.open(filepath) as image:
+        image.draft('L', (SAMPLE_SIZE * 4, SAMPLE_SIZE * 4))  # Cheap downscale where the codec supports it
+        sample = image.convert('L').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.BILINEAR)
+        return np.asarray(sample, dtype=np.float32)
+
+def perceptual_hashes(samples: np.ndarray) -> np.ndarray:
+    """64-bit pHashes for an (n, 32, 32) stack of grayscale samples"""
+    dct = _dct_matrix(SAMPLE_SIZE)
+    coefficients = np.einsum('ij,njk,lk->nil', dct, samples, dct)
+    low = coefficients[:, :HASH_SIZE, :HASH_SIZE].reshape(len(samples), -1)
+    medians = np.median(low[:, 1:], axis=1, keepdims=True)  # Skip the DC term
+    bits = (low > medians).astype(np.uint8)
+    return np.packbits(bits, axis=1).view('>u8').ravel().astype(np.uint64)
+
+def hamming_matrix(hashes: np.ndarray) -> np.ndarray:
+    """(n, n) pairwise bit distances between 64-bit hashes"""
+    xor = hashes[:, None] ^ hashes[None, :]
+    return _POPCOUNT[xor.view(np.uint8)].reshape(len(hashes), len(hashes), 8).sum(axis=2)
+
+class LibraryDeduplicator:
+    def __init__(self, library, threshold: int = 8, cache_filename: str = CACHE_FILENAME):
+        self.library = library
+        self.threshold = threshold  # Max differing bits (of 64) for two images to count as duplicates
+        self.cache_path = os.path.join(library.images_dir, cache_filename)
+
+    @staticmethod
+    def _stamp(filepath: str) -> str:
+        stat = os.stat(filepath)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _load_cache(self) -> Dict[str, tuple]:
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            data = np.load(self.cache_path)
+            return {path: (stamp, value) for path, stamp, value
+                    in zip(data['paths'].tolist(), data['stamps'].tolist(), data['hashes'])}
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable hash cache: {e}")
+            return {}
+
+    def _save_cache(self, cache: Dict[str, tuple]):
+        paths = sorted(cache)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.part.npz"
+        np.savez(tmp_path,
+                 paths=np.array(paths),
+                 stamps=np.array([cache[path][0] for path in paths]),
+                 hashes=np.array([cache[path][1] for path in paths], dtype=np.uint64))
+        os.replace(tmp_path, self.cache_path)
+
+    def hashes(self) -> Dict[str, int]:
+        """pHash of every library image, decoding only files that changed"""
+        cache = self._load_cache()
+        current, stale = {}, []
+        for name in self.library.names():
+            path = self.library.get(name)['path']
+            if not os.path.exists(path):
+                continue
+            stamp = self._stamp(path)
+            cached = cache.get(path)
+            if cached and cached[0] == stamp:
+                current[path] = cached
+            else:
+                stale.append((path, stamp))
+
+        if stale:
+            print(f"🔍 Hashing {len(stale)} image(s)...")
+            loaded = []
+            for path, stamp in stale:
+                try:
+                    loaded.append((path, stamp, _load_sample(path)))
+                except Exception as e:
+                    print(f"⚠️ Could not read {path}: {e}")
+            if loaded:
+                samples = np.stack([sample for _, _, sample in loaded])
+                for (path, stamp, _), value in zip(loaded, perceptual_hashes(samples)):
+                    current[path] = (stamp, value)
+
+        if stale or set(cache) != set(current):
+            self._save_cache(current)
+
+        by_path = {self.library.get(name)['path']: name for name in self.library.names()}
+        return {by_path[path]: int(value) for path, (_, value) in current.items() if path in by_path}
+
+    def _canonical_order(self, name: str) -> tuple:
+        """Most used first, then the oldest, then the shorter name"""
+        entry = self.library.get(name)
+        return (-(entry['use_count'] or 0), entry['created_at'] or 0, len(name), name)
+
+    def find_clusters(self) -> List[List[str]]:
+        """Groups of near-identical environments, canonical entry first"""
+        hashes = self.hashes()
+        names = sorted(hashes)
+        if len(names) < 2:
+            return []
+        distances = hamming_matrix(np.array([hashes[name] for name in names], dtype=np.uint64))
+
+        # Union-find over every pair within the threshold
+        parent = list(range(len(names)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in zip(*np.nonzero(np.triu(distances <= self.threshold, k=1))):
+            parent[find(i)] = find(j)
+
+        groups: Dict[int, List[str]] = {}
+        for i, name in enumerate(names):
+            groups.setdefault(find(i), []).append(name)
+        clusters = [sorted(group, key=self._canonical_order) for group in groups.values() if len(group) > 1]
+        return sorted(clusters, key=lambda cluster: cluster[0])
+
+    def merge(self, clusters: List[List[str]], delete_files: bool = True) -> dict:
+        """Fold each cluster into its canonical entry; duplicates become aliases"""
+        merged, freed = [], 0
+        for canonical, *duplicates in clusters:
+            canonical_path = self.library.get(canonical)['path']
+            for duplicate in duplicates:
+                entry = self.library.get(duplicate)
+                if not entry or entry['name'] != duplicate:
+                    continue
+                self.library.merge(duplicate, canonical)
+                if delete_files and entry['path'] != canonical_path and os.path.exists(entry['path']):
+                    freed += os.path.getsize(entry['path'])
+                    os.remove(entry['path'])
+                merged.append((duplicate, canonical))
+        return {'merged': merged, 'freed_bytes': freed}
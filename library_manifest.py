@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+"""
+Persistent manifest of the environment library.
+
+Every library image has a row in generated_images/library.db (SQLite)
+recording its name, path, size, dimensions, prompt, model, created and
+last-used times and use count, plus alias names merged into a canonical
+entry by deduplication and the pinned entries quota eviction must keep.
+The manifest is loaded into memory once at startup and written through on
+every change, so lookups never touch the filesystem and startup doesn't
+scale with the number of images.
+"""
+
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+DB_FILENAME = "library.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS environments (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER,
+    width INTEGER,
+    height INTEGER,
+    prompt TEXT,
+    model TEXT,
+    created_at REAL,
+    last_used_at REAL,
+    use_count INTEGER DEFAULT 0
+)
+"""
+
+ALIAS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+)
+"""
+
+PIN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pinned (
+    name TEXT PRIMARY KEY
+)
+"""
+
+def read_png_size(filepath: str) -> tuple:
+    """(width, height) from the PNG header, without decoding the image"""
+    try:
+        with open(filepath, 'rb') as f:
+            header = f.read(24)
+        if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+            return struct.unpack(">II", header[16:24])
+    except OSError:
+        pass
+    return (None, None)
+
+class LibraryManifest:
+    def __init__(self, images_dir: str = "generated_images", db_filename: str = DB_FILENAME, shared: bool = True):
+        self.images_dir = images_dir
+        self.shared = shared  # Other instances may write to the same library - check the database on misses
+        self.db_path = os.path.join(images_dir, db_filename)
+        os.makedirs(images_dir, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(SCHEMA)
+        self.conn.execute(ALIAS_SCHEMA)
+        self.conn.execute(PIN_SCHEMA)
+        self.conn.commit()
+
+        self.entries: Dict[str, dict] = {}
+        self.aliases: Dict[str, str] = {}  # alias -> canonical name
+        self.pinned: Set[str] = set()
+        self.load()
+
+        # First run with an existing library - index it once
+        if not self.entries and any(f.endswith('.png') for f in os.listdir(images_dir)):
+            print("📚 Building library manifest (one-time scan)...")
+            self.rescan()
+
+    def load(self):
+        """Load the whole manifest into memory"""
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM environments").fetchall()
+            self.entries = {row['name']: dict(row) for row in rows}
+            rows = self.conn.execute("SELECT alias, name FROM aliases").fetchall()
+            self.aliases = {row['alias']: row['name'] for row in rows}
+            self.pinned = {row['name'] for row in self.conn.execute("SELECT name FROM pinned").fetchall()}
+
+    def resolve(self, name: str) -> str:
+        """Canonical name for an alias (or the name itself)"""
+        return self.aliases.get(name, name)
+
+    def refresh(self, name: str) -> Optional[dict]:
+        """Re-read one environment from the database - another instance may have added it"""
+        with self._lock:
+            row = self.conn.execute("SELECT name FROM aliases WHERE alias = ?", (name,)).fetchone()
+            if row:
+                self.aliases[name] = row['name']
+                name = row['name']
+            row = self.conn.execute("SELECT * FROM environments WHERE name = ?", (name,)).fetchone()
+            if row:
+                self.entries[name] = dict(row)
+            else:
+                self.entries.pop(name, None)
+            return self.entries.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, name: str) -> Optional[dict]:
+        entry = self.entries.get(self.resolve(name))
+        if entry is None and self.shared:
+            entry = self.refresh(name)
+        return entry
+
+    def names(self, include_aliases: bool = False) -> List[str]:
+        if include_aliases:
+            return sorted(set(self.entries) | set(self.aliases))
+        return sorted(self.entries)
+
+    def aliases_of(self, name: str) -> List[str]:
+        return sorted(alias for alias, target in self.aliases.items() if target == name)
+
+    def total_size(self) -> int:
+        return sum(entry['size'] or 0 for entry in self.entries.values())
+
+    def add(self, name: str, path: str, prompt: Optional[str] = None, model: Optional[str] = None):
+        """Record a new (or replaced) library image"""
+        width, height = read_png_size(path)
+        now = time.time()
+        existing = self.entries.get(name, {})
+        entry = {
+            'name': name,
+            'path': path,
+            'size': os.path.getsize(path),
+            'width': width,
+            'height': height,
+            'prompt': prompt if prompt is not None else existing.get('prompt'),
+            'model': model if model is not None else existing.get('model'),
+            'created_at': existing.get('created_at') or now,
+            'last_used_at': existing.get('last_used_at'),
+            'use_count': existing.get('use_count') or 0,
+        }
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO environments VALUES "
+                "(:name, :path, :size, :width, :height, :prompt, :model, :created_at, :last_used_at, :use_count)",
+                entry
+            )
+            if self.aliases.pop(name, None):
+                # A real image now exists under this name
+                self.conn.execute("DELETE FROM aliases WHERE alias = ?", (name,))
+            self.conn.commit()
+            self.entries[name] = entry
+
+    def record_use(self, name: str):
+        name = self.resolve(name)
+        with self._lock:
+            entry = self.entries.get(name)
+            if not entry:
+                return
+            entry['last_used_at'] = time.time()
+            # Increment in SQL so concurrent instances don't lose each other's counts
+            self.conn.execute(
+                "UPDATE environments SET use_count = COALESCE(use_count, 0) + 1, last_used_at = ? WHERE name = ?",
+                (entry['last_used_at'], name)
+            )
+            row = self.conn.execute("SELECT use_count FROM environments WHERE name = ?", (name,)).fetchone()
+            entry['use_count'] = row['use_count'] if row else (entry['use_count'] or 0) + 1
+            self.conn.commit()
+
+    def remove(self, name: str):
+        """Forget an environment along with any aliases pointing at it"""
+        name = self.resolve(name)
+        with self._lock:
+            self.entries.pop(name, None)
+            for alias in self.aliases_of(name):
+                del self.aliases[alias]
+            self.conn.execute("DELETE FROM environments WHERE name = ?", (name,))
+            self.conn.execute("DELETE FROM aliases WHERE name = ?", (name,))
+            self.conn.commit()
+
+    def pin(self, name: str):
+        """Exempt an environment from quota eviction"""
+        name = self.resolve(name)
+        with self._lock:
+            self.pinned.add(name)
+            self.conn.execute("INSERT OR IGNORE INTO pinned VALUES (?)", (name,))
+            self.conn.commit()
+
+    def unpin(self, name: str):
+        name = self.resolve(name)
+        with self._lock:
+            self.pinned.discard(name)
+            self.conn.execute("DELETE FROM pinned WHERE name = ?", (name,))
+            self.conn.commit()
+
+    def is_pinned(self, name: str) -> bool:
+        return self.resolve(name) in self.pinned
+
+    def merge(self, duplicate: str, canonical: str):
+        """Fold a duplicate entry into a canonical one, keeping its name as an alias"""
+        with self._lock:
+            duplicate_entry = self.entries.pop(duplicate, None)
+            canonical_entry = self.entries[canonical]
+            if duplicate_entry:
+                canonical_entry['use_count'] = (canonical_entry['use_count'] or 0) + (duplicate_entry['use_count'] or 0)
+                canonical_entry['last_used_at'] = max(canonical_entry['last_used_at'] or 0,
+                                                      duplicate_entry['last_used_at'] or 0) or None
+            if duplicate in self.pinned:
+                self.pinned.discard(duplicate)
+                self.pinned.add(canonical)
+                self.conn.execute("DELETE FROM pinned WHERE name = ?", (duplicate,))
+                self.conn.execute("INSERT OR IGNORE INTO pinned VALUES (?)", (canonical,))
+            # Aliases of the duplicate now point at the canonical entry too
+            for alias in self.aliases_of(duplicate) + [duplicate]:
+                self.aliases[alias] = canonical
+            self.conn.execute("DELETE FROM environments WHERE name = ?", (duplicate,))
+            self.conn.execute("UPDATE aliases SET name = ? WHERE name = ?", (canonical, duplicate))
+            self.conn.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?)", (duplicate, canonical))
+            self.conn.execute(
+                "UPDATE environments SET use_count = ?, last_used_at = ? WHERE name = ?",
+                (canonical_entry['use_count'], canonical_entry['last_used_at'], canonical)
+            )
+            self.conn.commit()
+
+    def rescan(self) -> dict:
+        """Bring the manifest in line with the files on disk"""
+        on_disk = {f[:-len('.png')] for f in os.listdir(self.images_dir) if f.endswith('.png')}
+        added = [name for name in sorted(on_disk) if name not in self.entries]
+        removed = [name for name in list(self.entries) if name not in on_disk]
+
+        for name in added:
+            entry_path = os.path.join(self.images_dir, f"{name}.png")
+            self.add(name, entry_path)
+            self.entries[name]['created_at'] = os.path.getmtime(entry_path)
+            with self._lock:
+                self.conn.execute("UPDATE environments SET created_at = ? WHERE name = ?",
+                                  (self.entries[name]['created_at'], name))
+                self.conn.commit()
+        for name in removed:
+            self.remove(name)
+
+        return {'added': added, 'removed': removed}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+Disk quota for the environment library.
+
+When generated_images/ (library images plus their projector derivatives)
+grows past the quota, the least valuable environments are evicted: each is
+scored by use count decayed by time since it was last used, and the lowest
+scores go first. Pinned environments are never evicted. Every eviction is
+appended to generated_images/evicted.jsonl (name, aliases, prompt, usage)
+so the environments can be regenerated later, e.g. with
+`python pregenerate.py --evicted`.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Iterable, List, Optional
+
+EVICTION_LOG = "evicted.jsonl"
+DERIVATIVES_DIR = "projector"
+
+class LibraryQuota:
+    def __init__(self, library, max_bytes: int, recency_half_life_days: float = 14.0):
+        self.library = library
+        self.max_bytes = max_bytes
+        self.half_life = recency_half_life_days * 24 * 3600
+        self.log_path = os.path.join(library.images_dir, EVICTION_LOG)
+        self.derivatives_dir = os.path.join(library.images_dir, DERIVATIVES_DIR)
+        self._lock = threading.Lock()  # Generation workers finish concurrently
+
+    def _derivatives_of(self, name: str) -> List[str]:
+        if not os.path.isdir(self.derivatives_dir):
+            return []
+        pattern = re.compile(rf"^{re.escape(name)}_\d+x\d+_")
+        return [os.path.join(self.derivatives_dir, f) for f in os.listdir(self.derivatives_dir) if pattern.match(f)]
+
+    def usage(self) -> int:
+        """Bytes used by library images and projector derivatives"""
+        total = self.library.total_size()
+        if os.path.isdir(self.derivatives_dir):
+            total += sum(entry.stat().st_size for entry in os.scandir(self.derivatives_dir) if entry.is_file())
+        return total
+
+    def score(self, name: str, now: Optional[float] = None) -> float:
+        """Value of keeping an environment: uses, halved for every half-life it sits unused"""
+        entry = self.library.get(name)
+        now = now or time.time()
+        last_touched = entry['last_used_at'] or entry['created_at'] or now
+        decay = 0.5 ** (max(now - last_touched, 0) / self.half_life)
+        return ((entry['use_count'] or 0) + 1) * decay
+
+    def candidates(self, protect: Iterable[str] = ()) -> List[str]:
+        """Evictable environments, least valuable first"""
+        protected = {self.library.resolve(name) for name in protect}
+        now = time.time()
+        names = [name for name in self.library.names()
+                 if name not in protected and not self.library.is_pinned(name)]
+        return sorted(names, key=lambda name: (self.score(name, now), name))
+
+    def enforce(self, protect: Iterable[str] = ()) -> List[str]:
+        """Evict environments until the library fits the quota; returns the evicted names"""
+        with self._lock:
+            usage = self.usage()
+            if usage <= self.max_bytes:
+                return []
+
+            evicted = []
+            for name in self.candidates(protect):
+                if usage <= self.max_bytes:
+                    break
+                usage -= self.evict(name)
+                evicted.append(name)
+
+            if usage > self.max_bytes:
+                print(f"⚠️ Library still over quota ({usage // (1024 * 1024)}MB) - the rest is pinned or in use")
+            return evicted
+
+    def evict(self, name: str, reason: str = "quota") -> int:
+        """Remove one environment and its files, logging it for regeneration; returns bytes freed"""
+        entry = self.library.get(name)
+        if not entry:
+            return 0
+        record = {
+            'name': entry['name'],
+            'aliases': self.library.aliases_of(entry['name']),
+            'prompt': entry['prompt'],
+            'model': entry['model'],
+            'use_count': entry['use_count'] or 0,
+            'last_used_at': entry['last_used_at'],
+            'evicted_at': time.time(),
+            'reason': reason,
+        }
+
+        freed = 0
+        for path in [entry['path']] + self._derivatives_of(entry['name']):
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+        self.library.remove(entry['name'])
+
+        with open(self.log_path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"🗑️ Evicted {entry['name']} (used {record['use_count']}x) - logged for regeneration")
+        return freed
+
+def read_eviction_log(images_dir: str = "generated_images") -> List[dict]:
+    """Evicted environments, most recent record per name, skipping ones that are back in the library"""
+    log_path = os.path.join(images_dir, EVICTION_LOG)
+    if not os.path.exists(log_path):
+        return []
+    records = {}
+    with open(log_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['name']] = record
+    return [record for name, record in sorted(records.items())
+            if not os.path.exists(os.path.join(images_dir, f"{name}.png"))]
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+"""
+Local location classifier that gates the gpt-3.5-turbo detection call.
+
+A hashed bag-of-words logistic regression (words, word bigrams and keyword
+engine categories, hashed into a fixed-size weight vector) is trained with
+NumPy on the YES/NO decisions the LLM made during earlier shows. At runtime
+utterances it is confident about are answered locally in microseconds; only
+the ambiguous band between the two thresholds is escalated to the API.
+
+Every LLM decision is appended to generated_images/location_decisions.jsonl.
+Train (and see the gate's precision/recall on a test split that neither
+training nor threshold calibration saw) with:
+  python location_gate.py
+  python location_gate.py --log show_2024_05_03.log --target-precision 0.98
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from keyword_engine import get_keyword_engine
+
+DECISIONS_FILENAME = "location_decisions.jsonl"
+MODEL_FILENAME = "location_gate.npz"
+FEATURE_DIM = 1 << 15
+
+# Console lines printed by the classifier, for training from saved show output
+_LOG_YES = re.compile(r"📍 Location detected - checking library for: '(.*)'$")
+_LOG_NO = re.compile(r"🚫 No location context detected in: '(.*)' - skipping")
+_LOG_GATED = "🧮 Local gate:"
+
+def features(text: str, dim: int = FEATURE_DIM) -> np.ndarray:
+    """Hashed feature indices for an utterance"""
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    tokens = set(words)
+    tokens.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    tokens.update(f"cat:{category}" for category in get_keyword_engine().categories(text))
+    return np.fromiter((zlib.crc32(token.encode()) % dim for token in tokens), dtype=np.int64, count=len(tokens))
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+class DecisionLog:
+    """Append-only JSONL log of LLM location decisions (training data for the gate)"""
+
+    def __init__(self, images_dir: str = "generated_images"):
+        self.path = os.path.join(images_dir, DECISIONS_FILENAME)
+        self._lock = threading.Lock()
+
+    def record(self, text: str, is_location: bool, source: str):
+        line = json.dumps({'text': text, 'is_location': bool(is_location), 'source': source, 'at': time.time()})
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + "\n")
+
+def read_decisions(path: str) -> List[Tuple[str, bool]]:
+    examples = []
+    if not os.path.exists(path):
+        return examples
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                examples.append((record['text'], bool(record['is_location'])))
+            except (ValueError, KeyError):
+                continue
+    return examples
+
+def read_show_log(path: str) -> List[Tuple[str, bool]]:
+    """(utterance, is_location) pairs from saved console output of a show"""
+    examples = []
+    gated = False  # The gate's own answers are not LLM labels
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip()
+            if _LOG_GATED in line:
+                gated = True
+                continue
+            yes, no = _LOG_YES.search(line), _LOG_NO.search(line)
+            if (yes or no) and not gated:
+                examples.append((yes.group(1), True) if yes else (no.group(1), False))
+            if yes or no:
+                gated = False
+    return examples
+
+class LocationGate:
+    def __init__(self, weights: np.ndarray, bias: float, low: float = 0.1, high: float = 0.9):
+        self.weights = weights
+        self.bias = bias
+        self.low = low    # At or below: answered NO locally
+        self.high = high  # At or above: answered YES locally
+        self.dim = len(weights)
+        self.counts = {'yes': 0, 'no': 0, 'escalated': 0}
+
+    def probability(self, text: str) -> float:
+        return float(_sigmoid(self.weights[features(text, self.dim)].sum() + self.bias))
+
+    def decide(self, text: str, local_yes: bool = True) -> Optional[bool]:
+        """True/False when confident, None to escalate to the LLM (also for a YES when local_yes is off)"""
+        p = self.probability(text)
+        if p >= self.high and local_yes:
+            self.counts['yes'] += 1
+            return True
+        if p <= self.low:
+            self.counts['no'] += 1
+            return False
+        self.counts['escalated'] += 1
+        return None
+
+    def stats(self) -> dict:
+        total = sum(self.counts.values())
+        local = self.counts['yes'] + self.counts['no']
+        return dict(self.counts, local_rate=local / total if total else 0.0)
+
+    @classmethod
+    def train(cls, examples: List[Tuple[str, bool]], dim: int = FEATURE_DIM, epochs: int = 300,
+              learning_rate: float = 0.5, l2: float = 1e-4) -> "LocationGate":
+        """Full-batch gradient descent on sparse hashed features"""
+        rows = [features(text, dim) for text, _ in examples]
+        labels = np.array([label for _, label in examples], dtype=np.float64)
+        lengths = np.array([len(row) for row in rows])
+        flat = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        row_of = np.repeat(np.arange(len(rows)), lengths)
+
+        # Balance classes so a quiet show doesn't teach "always NO"
+        positives = labels.sum()
+        sample_weight = np.where(labels == 1, len(labels) / (2 * max(positives, 1)),
+                                 len(labels) / (2 * max(len(labels) - positives, 1)))
+
+        weights = np.zeros(dim)
+        bias = 0.0
+        for _ in range(epochs):
+            logits = np.bincount(row_of, weights=weights[flat], minlength=len(rows)) + bias
+            error = (_sigmoid(logits) - labels) * sample_weight / len(rows)
+            gradient = np.bincount(flat, weights=error[row_of], minlength=dim) + l2 * weights
+            weights -= learning_rate * gradient
+            bias -= learning_rate * error.sum()
+        return cls(weights, bias)
+
+    def calibrate(self, examples: List[Tuple[str, bool]], target_precision: float = 0.97):
+        """Widest local bands whose decisions stay at target precision on calibration examples"""
+        probabilities = np.array([self.probability(text) for text, _ in examples])
+        labels = np.array([label for _, label in examples])
+
+        self.high = 1.01
+        for threshold in np.unique(probabilities):
+            chosen = probabilities >= threshold
+            if chosen.any() and labels[chosen].mean() >= target_precision:
+                self.high = float(threshold)
+                break
+
+        self.low = -0.01
+        for threshold in np.unique(probabilities)[::-1]:
+            chosen = probabilities <= threshold
+            if chosen.any() and (~labels[chosen]).mean() >= target_precision and threshold < self.high:
+                self.low = float(threshold)
+                break
+
+    def evaluate(self, examples: List[Tuple[str, bool]]) -> dict:
+        """Precision/recall of the gate's local answers against the LLM's labels"""
+        decisions = [(self.decide(text), label) for text, label in examples]
+        self.counts = {'yes': 0, 'no': 0, 'escalated': 0}
+        local_yes = [label for decision, label in decisions if decision is True]
+        local_no = [label for decision, label in decisions if decision is False]
+        positives = sum(label for _, label in decisions)
+        negatives = len(decisions) - positives
+        return {
+            'examples': len(decisions),
+            'local_rate': (len(local_yes) + len(local_no)) / len(decisions) if decisions else 0.0,
+            'yes_precision': sum(local_yes) / len(local_yes) if local_yes else 1.0,
+            'yes_recall': sum(local_yes) / positives if positives else 0.0,
+            'no_precision': local_no.count(False) / len(local_no) if local_no else 1.0,
+            'no_recall': local_no.count(False) / negatives if negatives else 0.0,
+        }
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{os.getpid()}.part.npz"
+        np.savez(tmp_path, weights=self.weights.astype(np.float32), bias=self.bias, low=self.low, high=self.high)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LocationGate"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            data = np.load(path)
+            return cls(data['weights'], float(data['bias']), float(data['low']), float(data['high']))
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable location gate: {e}")
+            return None
+
+def main():
+    parser = argparse.ArgumentParser(description='🎭 Improv AI - train the local location gate from logged LLM decisions')
+    parser.add_argument('--decisions', default=os.path.join("generated_images", DECISIONS_FILENAME),
+                        help='Decision log written during shows (default: generated_images/location_decisions.jsonl)')
+    parser.add_argument('--log', nargs='*', default=[], metavar='FILE',
+                        help='Saved console output of shows to learn from as well')
+    parser.add_argument('--target-precision', type=float, default=0.97,
+                        help='Precision local answers must reach on the calibration split (default: 0.97)')
+    parser.add_argument('--output', default=os.path.join("generated_images", MODEL_FILENAME),
+                        help='Where to save the model (default: generated_images/location_gate.npz)')
+    args = parser.parse_args()
+
+    examples = read_decisions(args.decisions)
+    for path in args.log:
+        examples.extend(read_show_log(path))
+    examples = list(dict.fromkeys(examples))  # Repeated lines would leak into the calibration and test sets
+
+    positives = sum(label for _, label in examples)
+    print(f"📚 {len(examples)} labelled utterances ({positives} YES, {len(examples) - positives} NO)")
+    if len(examples) < 50 or positives < 10 or len(examples) - positives < 10:
+        print("❌ Need at least 50 utterances with 10 of each answer - run a few more shows first")
+        return
+
+    # 60% to fit the weights, 20% to place the thresholds, 20% untouched for the report
+    order = np.random.default_rng(0).permutation(len(examples))
+    fit_end, calibrate_end = int(len(examples) * 0.6), int(len(examples) * 0.8)
+    train = [examples[i] for i in order[:fit_end]]
+    calibration = [examples[i] for i in order[fit_end:calibrate_end]]
+    test = [examples[i] for i in order[calibrate_end:]]
+
+    gate = LocationGate.train(train)
+    gate.calibrate(calibration, args.target_precision)
+    report = gate.evaluate(test)
+
+    print(f"🧮 Thresholds: NO at p ≤ {gate.low:.2f}, YES at p ≥ {gate.high:.2f}, otherwise ask the LLM")
+    print(f"📊 Test split ({report['examples']} unseen utterances): {report['local_rate']:.0%} answered locally")
+    print(f"   YES: precision {report['yes_precision']:.1%}, recall {report['yes_recall']:.1%}")
+    print(f"   NO:  precision {report['no_precision']:.1%}, recall {report['no_recall']:.1%}")
+
+    # Save the model the report describes (thresholds are tied to its probabilities)
+    gate.save(args.output)
+    print(f"✅ Saved {args.output}")
+
+if __name__ == "__main__":
+    main()
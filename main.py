@@ -9,9 +9,18 @@ from speech_recognizer import RealTimeSpeechRecognizer
 from image_generator import AIImageGenerator
 from qlab_integration import QLab
 from sound_generator import EnvironmentSoundGenerator
+from pipeline import ImprovPipeline
+from projector_derivatives import parse_resolution
+from asr_backends import BACKENDS, create_backend
+from voice_activity import profile_names
 
 class ImprovAIApp:
-    def __init__(self, fast_mode=False, auto_default_after_minutes=None, enable_ambient_sounds=True):
+    def __init__(self, fast_mode=False, auto_default_after_minutes=None, enable_ambient_sounds=True,
+                 classification_mode="fused", speculative_prompt=False, prefetch_budget=0,
+                 semantic_lookup="openai", semantic_threshold=None, local_matching=True,
+                 cache_transcripts=True, projector_resolution=None, library_quota_mb=None,
+                 location_gate=True, asr_backend="google", asr_model=None, record_audio_dir=None,
+                 partial_transcripts=False, partial_interval=1.0, vad_profile="default"):
         # Load environment variables
         load_dotenv()
         
@@ -21,16 +30,44 @@ class ImprovAIApp:
             sys.exit(1)
         
         # Initialize components (default to DALL-E 3 for quality)
-        self.image_generator = AIImageGenerator(self.openai_api_key, fast_mode=fast_mode)
-        self.qlab = QLab(auto_stop_previous=True)  # Auto-stop previous backgrounds
+        self.image_generator = AIImageGenerator(self.openai_api_key, fast_mode=fast_mode,
+                                                classification_mode=classification_mode,
+                                                speculative_prompt=speculative_prompt,
+                                                semantic_lookup=semantic_lookup,
+                                                semantic_threshold=semantic_threshold,
+                                                local_matching=local_matching,
+                                                cache_transcripts=cache_transcripts,
+                                                library_quota_mb=library_quota_mb,
+                                                location_gate=location_gate)
+        self.qlab = QLab(auto_stop_previous=True,  # Auto-stop previous backgrounds
+                         projector_resolution=projector_resolution)
         self.sound_generator = EnvironmentSoundGenerator()
-        self.speech_recognizer = RealTimeSpeechRecognizer(self.on_speech_recognized)
+        self.min_interval = 15  # Minimum seconds between generations
+        self.pipeline = ImprovPipeline(
+            self.image_generator,
+            self.qlab,
+            sound_generator=self.sound_generator if enable_ambient_sounds else None,
+            min_words=2,
+            min_interval=self.min_interval,
+            prefetch_budget=prefetch_budget,
+            on_published=self.on_background_published
+        )
+        backend = None
+        if asr_backend != 'google':
+            try:
+                backend = create_backend(asr_backend, model=asr_model)
+            except RuntimeError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+        self.speech_recognizer = RealTimeSpeechRecognizer(
+            self.pipeline.submit, backend=backend, record_dir=record_audio_dir,
+            partial_callback=self.pipeline.submit_partial if partial_transcripts else None,
+            partial_interval=partial_interval, vad_profile=vad_profile)
         
         # State
         self.running = False
-        self.last_generation_time = 0
         self.last_activity_time = time.time()
-        self.min_interval = 15  # Minimum seconds between generations
+        self.last_queue_report = 0
         self.fast_mode = fast_mode
         self.auto_default_after_minutes = auto_default_after_minutes
         self.last_default_check = time.time()
@@ -39,55 +76,9 @@ class ImprovAIApp:
         # Setup signal handler for graceful shutdown
         signal.signal(signal.SIGINT, self.signal_handler)
     
-    def on_speech_recognized(self, text: str):
-        """Callback for when speech is recognized"""
-        current_time = time.time()
-        
-        # Filter out very short phrases (but be more lenient)
-        if len(text.split()) < 2:
-            print(f"Phrase too short, ignoring: '{text}'")
-            return
-        
-        print(f"\n🎭 Heard: '{text}'")
-        
-        # Generate image (includes location detection and smart rate limiting)
-        generation_start = time.time()
-        
-        # Pass rate limiting info to the image generator
-        time_since_last_generation = current_time - self.last_generation_time
-        result = self.image_generator.generate_background_image(
-            text, 
-            min_interval=self.min_interval,
-            time_since_last=time_since_last_generation
-        )
-        
-        if result:
-            image_path, was_reused = result if isinstance(result, tuple) else (result, False)
-            generation_time = time.time() - generation_start
-            
-            if was_reused:
-                print(f"⚡ Environment loaded instantly (from library)")
-            else:
-                mode_text = "fast mode" if self.fast_mode else "high quality"
-                print(f"⚡ Generated in {generation_time:.1f}s ({mode_text})")
-            
-            # Send to QLab
-            success = self.qlab.create_and_start_video_cue(image_path, duration=20)
-            if success:
-                print(f"✅ Background updated in QLab")
-                
-                # Add ambient sound for the environment (if enabled)
-                if self.enable_ambient_sounds:
-                    environment_name = os.path.basename(image_path).replace('.png', '')
-                    self.sound_generator.create_ambient_sound_cue(environment_name)
-                
-                # Only update rate limiting time for actual generations, not library reuse
-                if not was_reused:
-                    self.last_generation_time = current_time
-                self.last_activity_time = current_time  # Update activity time
-            else:
-                print(f"❌ Failed to update QLab")
-        # Note: if image_path is None, location detection already printed the reason
+    def on_background_published(self, image_path: str, was_reused: bool):
+        """Called by the pipeline once a background is live in QLab"""
+        self.last_activity_time = time.time()
     
     def start(self):
         """Start the application"""
@@ -128,6 +119,7 @@ class ImprovAIApp:
         print("\nPress Ctrl+C to stop\n")
         
         self.running = True
+        self.pipeline.start()
         self.speech_recognizer.start_listening()
         
         try:
@@ -135,6 +127,11 @@ class ImprovAIApp:
             while self.running:
                 time.sleep(1)
                 
+                # Report pipeline backlog while work is queued
+                if self.pipeline.is_busy() and time.time() - self.last_queue_report > 10:
+                    print(f"📊 Pipeline queues: {self.pipeline.format_queue_depths()}")
+                    self.last_queue_report = time.time()
+                
                 # Check for auto-default backdrop
                 if self.auto_default_after_minutes:
                     current_time = time.time()
@@ -156,6 +153,7 @@ class ImprovAIApp:
         print("\n🛑 Stopping Improv AI...")
         self.running = False
         self.speech_recognizer.stop_listening_method()
+        self.pipeline.stop()
         print("Goodbye!")
     
     def signal_handler(self, signum, frame):
@@ -171,8 +169,46 @@ def main():
     parser.add_argument('--no-sounds', action='store_true', help='Disable ambient sound generation')
     parser.add_argument('--auto-default', type=int, metavar='MINUTES', 
                        help='Auto-trigger default backdrop after N minutes of inactivity')
+    parser.add_argument('--classification', choices=AIImageGenerator.CLASSIFICATION_MODES, default='fused',
+                       help='fused: one LLM call for detection, naming and prompt (default); '
+                            'speculative: detection and naming in parallel; sequential: separate calls')
+    parser.add_argument('--speculative-prompt', action='store_true',
+                       help='With --classification speculative, also start prompt enhancement in parallel')
+    parser.add_argument('--prefetch-budget', type=int, default=0, metavar='IMAGES',
+                       help='Pre-generate up to N likely next environments while the scene is quiet (default: off)')
+    parser.add_argument('--semantic-lookup', choices=AIImageGenerator.SEMANTIC_LOOKUP_MODES, default='openai',
+                       help='Embeddings used to reuse near-synonym environments (default: openai, local fallback)')
+    parser.add_argument('--semantic-threshold', type=float, metavar='SIMILARITY',
+                       help='Cosine similarity needed to reuse a library environment')
+    parser.add_argument('--no-local-match', action='store_true',
+                       help='Always ask the LLM, even when an utterance clearly names a library environment')
+    parser.add_argument('--no-transcript-cache', action='store_true',
+                       help='Re-classify repeated lines instead of reusing cached results')
+    parser.add_argument('--projector', type=parse_resolution, metavar='WIDTHxHEIGHT',
+                       help='Projector resolution for cue images (default: $PROJECTOR_RESOLUTION or 1920x1080)')
+    parser.add_argument('--library-quota', type=float, metavar='MB',
+                       help='Disk quota for generated_images/ - least used, unpinned environments are evicted past it')
+    parser.add_argument('--no-location-gate', action='store_true',
+                       help='Send every line to the LLM detector even when a trained local gate exists')
+    parser.add_argument('--asr', choices=BACKENDS, default='google',
+                       help='Speech recognition engine: google (online, default), vosk or whisper (offline, CPU)')
+    parser.add_argument('--asr-model', metavar='PATH_OR_NAME',
+                       help='Model for --asr vosk (folder) or whisper (name such as base.en, or folder)')
+    parser.add_argument('--record-audio', metavar='DIR',
+                       help='Save every heard phrase as .wav in DIR (for python asr_backends.py DIR)')
+    parser.add_argument('--partials', action='store_true',
+                       help='Start location detection on partial transcripts while a line is still being spoken')
+    parser.add_argument('--partial-interval', type=float, default=1.0, metavar='SECONDS',
+                       help='With --partials on google/whisper, re-transcribe the line every N seconds of speech '
+                            '(each is a full request for google; vosk streams natively)')
+    parser.add_argument('--vad-profile', default='default', choices=profile_names(),
+                       help='Voice activity endpointing profile from vad_profiles.json (default: default)')
+    parser.add_argument('--no-vad', action='store_true',
+                       help="End lines with speech_recognition's fixed 1.5s pause instead (not with --partials)")
     
     args = parser.parse_args()
+    if args.partials and args.no_vad:
+        parser.error("--partials needs voice activity endpointing and cannot be combined with --no-vad")
     
     # Check if .env file exists
     if not os.path.exists('.env'):
@@ -190,7 +226,23 @@ def main():
     app = ImprovAIApp(
         fast_mode=args.fast,
         auto_default_after_minutes=args.auto_default,
-        enable_ambient_sounds=not args.no_sounds
+        enable_ambient_sounds=not args.no_sounds,
+        classification_mode=args.classification,
+        speculative_prompt=args.speculative_prompt,
+        prefetch_budget=args.prefetch_budget,
+        semantic_lookup=args.semantic_lookup,
+        semantic_threshold=args.semantic_threshold,
+        local_matching=not args.no_local_match,
+        cache_transcripts=not args.no_transcript_cache,
+        projector_resolution=args.projector,
+        library_quota_mb=args.library_quota,
+        location_gate=not args.no_location_gate,
+        asr_backend=args.asr,
+        asr_model=args.asr_model,
+        record_audio_dir=args.record_audio,
+        partial_transcripts=args.partials,
+        partial_interval=args.partial_interval,
+        vad_profile=None if args.no_vad else args.vad_profile
     )
     app.start()
 
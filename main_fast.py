@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 from speech_recognizer import RealTimeSpeechRecognizer
 from image_generator import AIImageGenerator
 from qlab_integration import QLab
+from pipeline import ImprovPipeline
 
 class ImprovAIApp:
     def __init__(self, fast_mode=True):
@@ -20,56 +21,27 @@ class ImprovAIApp:
             sys.exit(1)
         
         # Initialize components (fast mode for speed)
-        self.image_generator = AIImageGenerator(self.openai_api_key, fast_mode=fast_mode)
+        self.image_generator = AIImageGenerator(self.openai_api_key, fast_mode=fast_mode,
+                                                classification_mode="fused")
         self.qlab = QLab(auto_stop_previous=True)  # Auto-stop previous backgrounds
-        self.speech_recognizer = RealTimeSpeechRecognizer(self.on_speech_recognized)
+        self.min_interval = 15  # Minimum seconds between generations
+        self.pipeline = ImprovPipeline(
+            self.image_generator,
+            self.qlab,
+            min_words=3,
+            min_interval=self.min_interval,
+            rate_limit_reuse=True
+        )
+        self.speech_recognizer = RealTimeSpeechRecognizer(self.pipeline.submit)
         
         # State
         self.running = False
-        self.last_generation_time = 0
-        self.min_interval = 15  # Minimum seconds between generations
+        self.last_queue_report = 0
         self.fast_mode = fast_mode
         
         # Setup signal handler for graceful shutdown
         signal.signal(signal.SIGINT, self.signal_handler)
     
-    def on_speech_recognized(self, text: str):
-        """Callback for when speech is recognized"""
-        current_time = time.time()
-        
-        # Rate limiting to avoid too many generations
-        if current_time - self.last_generation_time < self.min_interval:
-            print(f"Rate limited - waiting {self.min_interval - (current_time - self.last_generation_time):.1f}s")
-            return
-        
-        # Filter out very short phrases
-        if len(text.split()) < 3:
-            print(f"Phrase too short, ignoring: '{text}'")
-            return
-        
-        print(f"\n🎭 Heard: '{text}'")
-        
-        # Generate image (includes location detection)
-        generation_start = time.time()
-        image_path = self.image_generator.generate_background_image(text)
-        
-        if image_path:
-            generation_time = time.time() - generation_start
-            if generation_time < 2:  # Reused from library
-                print(f"⚡ Environment loaded instantly (from library)")
-            else:  # Newly generated
-                mode_text = "fast mode" if self.fast_mode else "high quality"
-                print(f"⚡ Generated in {generation_time:.1f}s ({mode_text})")
-            
-            # Send to QLab
-            success = self.qlab.create_and_start_video_cue(image_path, duration=20)
-            if success:
-                print(f"✅ Background updated in QLab")
-                self.last_generation_time = current_time
-            else:
-                print(f"❌ Failed to update QLab")
-        # Note: if image_path is None, location detection already printed the reason
-    
     def start(self):
         """Start the application"""
         print("🎭 Improv AI Background Generator (Fast Mode - DALL-E 2)")
@@ -100,12 +72,18 @@ class ImprovAIApp:
         print("\nPress Ctrl+C to stop\n")
         
         self.running = True
+        self.pipeline.start()
         self.speech_recognizer.start_listening()
         
         try:
             # Keep the main thread alive
             while self.running:
                 time.sleep(1)
+                
+                # Report pipeline backlog while work is queued
+                if self.pipeline.is_busy() and time.time() - self.last_queue_report > 10:
+                    print(f"📊 Pipeline queues: {self.pipeline.format_queue_depths()}")
+                    self.last_queue_report = time.time()
         except KeyboardInterrupt:
             self.stop()
     
@@ -114,6 +92,7 @@ class ImprovAIApp:
         print("\n🛑 Stopping Improv AI...")
         self.running = False
         self.speech_recognizer.stop_listening_method()
+        self.pipeline.stop()
         print("Goodbye!")
     
     def signal_handler(self, signum, frame):
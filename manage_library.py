@@ -5,23 +5,99 @@ import glob
 import shutil
 from dotenv import load_dotenv
 from image_generator import AIImageGenerator
+from library_manifest import LibraryManifest
+from library_dedup import LibraryDeduplicator
+from library_quota import LibraryQuota, read_eviction_log
 
 def show_library():
     """Show all environments in the library"""
-    images_dir = "generated_images"
-    files = sorted([f for f in os.listdir(images_dir) if f.endswith('.png')])
+    library = LibraryManifest("generated_images")
     
     print("📚 Complete Environment Library")
     print("=" * 40)
     
-    if not files:
+    if not len(library):
         print("No environments in library yet.")
         return
     
-    for i, filename in enumerate(files, 1):
-        env_name = filename.replace('.png', '').replace('_', ' ')
-        size = os.path.getsize(os.path.join(images_dir, filename)) // 1024
-        print(f"{i:2d}. {env_name} ({size}KB)")
+    for i, name in enumerate(library.names(), 1):
+        entry = library.get(name)
+        env_name = name.replace('_', ' ')
+        size = (entry['size'] or 0) // 1024
+        dimensions = f", {entry['width']}x{entry['height']}" if entry['width'] else ""
+        aliases = library.aliases_of(name)
+        also = f" [also: {', '.join(alias.replace('_', ' ') for alias in aliases)}]" if aliases else ""
+        pin = " 📌" if library.is_pinned(name) else ""
+        print(f"{i:2d}. {env_name}{pin} ({size}KB{dimensions}, used {entry['use_count'] or 0}x){also}")
+    
+    print(f"\nTotal: {len(library)} environments, {library.total_size() // (1024 * 1024)}MB")
+
+def rescan_library():
+    """Sync the library manifest with files added or deleted by hand"""
+    library = LibraryManifest("generated_images")
+    changes = library.rescan()
+    print(f"🔄 Manifest updated: {len(changes['added'])} added, {len(changes['removed'])} removed")
+    for name in changes['added']:
+        print(f"   + {name}")
+    for name in changes['removed']:
+        print(f"   - {name}")
+
+def merge_duplicates():
+    """Find near-identical images and merge them into one entry with aliases"""
+    library = LibraryManifest("generated_images")
+    deduplicator = LibraryDeduplicator(library)
+    clusters = deduplicator.find_clusters()
+    
+    if not clusters:
+        print("No duplicate images found.")
+        return
+    
+    print(f"Found {len(clusters)} group(s) of near-identical images:")
+    for canonical, *duplicates in clusters:
+        print(f"   • keep {canonical}, alias {', '.join(duplicates)}")
+    
+    if input("\nMerge these and delete the duplicate files? (y/n): ").strip().lower() != 'y':
+        print("Skipped.")
+        return
+    
+    result = deduplicator.merge(clusters)
+    print(f"✅ Merged {len(result['merged'])} duplicate(s), freed {result['freed_bytes'] // (1024 * 1024)}MB")
+
+def toggle_pin():
+    """Pin an environment so quota eviction never removes it (or unpin it)"""
+    library = LibraryManifest("generated_images")
+    name = input("Environment to pin/unpin (e.g. 'coffee shop'): ").strip().lower().replace(' ', '_')
+    
+    if name not in library:
+        print(f"Environment '{name}' is not in the library.")
+        return
+    
+    if library.is_pinned(name):
+        library.unpin(name)
+        print(f"📍 Unpinned: {library.resolve(name)}")
+    else:
+        library.pin(name)
+        print(f"📌 Pinned: {library.resolve(name)}")
+
+def enforce_quota():
+    """Evict least used, unpinned environments until the library fits a disk quota"""
+    library = LibraryManifest("generated_images")
+    quota_mb = input("Library quota in MB: ").strip()
+    try:
+        quota = LibraryQuota(library, int(float(quota_mb) * 1024 * 1024))
+    except ValueError:
+        print("Please enter a number.")
+        return
+    
+    usage = quota.usage()
+    print(f"Library uses {usage // (1024 * 1024)}MB of {quota_mb}MB")
+    if usage <= quota.max_bytes:
+        print("Within quota - nothing to evict.")
+        return
+    
+    evicted = quota.enforce()
+    print(f"✅ Evicted {len(evicted)} environment(s), now {quota.usage() // (1024 * 1024)}MB")
+    print(f"   {len(read_eviction_log())} evicted environment(s) can be restored with: python3 pregenerate.py --evicted")
 
 def clean_old_files():
     """Convert old timestamp files to proper environment names"""
@@ -66,6 +142,7 @@ def clean_old_files():
                 
                 # Rename the file
                 shutil.move(old_file, new_path)
+                generator.library.add(new_name, new_path)
                 print(f"✅ Renamed to: {new_name}.png")
             else:
                 print("Skipped.")
@@ -82,19 +159,31 @@ def main():
         print("\nOptions:")
         print("1. Show library")
         print("2. Clean old timestamp files")
-        print("3. Exit")
+        print("3. Rescan library folder")
+        print("4. Merge duplicate images")
+        print("5. Pin/unpin environment")
+        print("6. Enforce disk quota")
+        print("7. Exit")
         
-        choice = input("\nChoose option (1-3): ").strip()
+        choice = input("\nChoose option (1-7): ").strip()
         
         if choice == "1":
             show_library()
         elif choice == "2":
             clean_old_files()
         elif choice == "3":
+            rescan_library()
+        elif choice == "4":
+            merge_duplicates()
+        elif choice == "5":
+            toggle_pin()
+        elif choice == "6":
+            enforce_quota()
+        elif choice == "7":
             print("Goodbye!")
             break
         else:
-            print("Invalid choice. Please enter 1, 2, or 3.")
+            print("Invalid choice. Please enter a number from 1 to 7.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
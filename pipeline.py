@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+
+"""
+Asyncio pipeline for Improv AI.
+
+Speech flows through explicit stages connected by bounded queues:
+
+    transcript → classify → resolve library → generate → publish
+
+The recognizer thread only hands transcripts over, so listening keeps
+going while a DALL-E generation is in flight. Blocking work (OpenAI calls,
+QLab AppleScript) runs in a thread pool from inside the event loop.
+Transcripts wait in a latest-wins UtteranceQueue rather than a FIFO, and
+generations run as cancellable jobs on a GenerationWorkerPool. Partial
+transcripts of a phrase still being spoken can start work early; the final
+transcript is then skipped when the partial already covered it. When a
+prefetch budget is set, idle API capacity is used to pre-generate likely
+next environments.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence
+from utterance_queue import UtteranceQueue
+from generation_workers import GenerationJob, GenerationWorkerPool
+from http_session import keep_warm, warm_up_in_background
+from prefetcher import EnvironmentPrefetcher
+from transcript_cache import normalize_transcript
+
+class ImprovPipeline:
+    STAGES = ('transcript', 'classify', 'resolve', 'generate', 'publish')
+
+    def __init__(self, image_generator, qlab, sound_generator=None,
+                 min_words: int = 2, min_interval: float = 15, rate_limit_reuse: bool = False,
+                 queue_size: int = 4, cue_duration: int = 20, generation_workers: int = 2,
+                 prefetch_budget: int = 0, prefetch_idle_delay: float = 5,
+                 on_published: Optional[Callable[[str, bool], None]] = None):
+        self.image_generator = image_generator
+        self.qlab = qlab
+        self.sound_generator = sound_generator
+        self.min_words = min_words
+        self.min_interval = min_interval  # Minimum seconds between generations
+        self.rate_limit_reuse = rate_limit_reuse  # Also rate limit library reuse
+        self.queue_size = queue_size
+        self.cue_duration = cue_duration
+        self.on_published = on_published
+        self.utterances = UtteranceQueue(capacity=queue_size)
+        self.generation_pool = GenerationWorkerPool(image_generator, max_workers=generation_workers,
+                                                    prepare_image=qlab.prepare_image)
+        self.prefetcher = None
+        if prefetch_budget > 0:
+            self.prefetcher = EnvironmentPrefetcher(image_generator, self.generation_pool, budget=prefetch_budget)
+        self.prefetch_idle_delay = prefetch_idle_delay  # Quiet seconds before prefetching
+
+        # State
+        self.last_generation_time = 0
+        self.last_publish_time = 0
+        self.last_heard_time = 0
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.loop = None
+        self.thread = None
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline")
+        self._stop_event = None
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._awaited_jobs = set()
+        self._partial_keywords: "OrderedDict[int, frozenset]" = OrderedDict()  # Recognizer thread: keywords already sent per phrase
+        self._phrases: "OrderedDict[int, dict]" = OrderedDict()  # Loop: partials that reached classification
+        self.partials_used = 0
+        self.finals_skipped = 0
+
+    def start(self):
+        """Start the event loop in a background thread"""
+        if self.thread and self.thread.is_alive():
+            return
+
+        # Pre-establish API/CDN connections so the first cue doesn't pay for TLS
+        warm_up_in_background()
+        keep_warm()
+        # Projector-size copies of the existing library, so reused environments cue without a resize
+        self._stopping.clear()
+        threading.Thread(target=self._warm_derivatives, daemon=True).start()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+        self._ready.wait(timeout=5)
+
+    def stop(self):
+        """Stop all stages and the event loop"""
+        self._stopping.set()
+        if self.loop and self._stop_event:
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+        self.generation_pool.shutdown()
+
+        stats = self.utterance_stats()
+        print(f"📊 Utterances: {stats['processed']} processed, {stats['merged']} merged, {stats['dropped']} dropped")
+        if self.partials_used:
+            print(f"⏩ Partials: {self.partials_used} started early, {self.finals_skipped} final transcripts not redone")
+        if self.prefetcher:
+            prefetch = self.prefetcher.stats()
+            print(f"🔮 Prefetch: {prefetch['hits']}/{prefetch['prefetched']} hits ({prefetch['hit_rate']:.0%}), "
+                  f"{prefetch['budget_left']} budget left")
+        transcript_cache = getattr(self.image_generator, 'transcript_cache', None)
+        if transcript_cache:
+            cache = transcript_cache.stats()
+            print(f"💾 Transcript cache: {cache['memory_hits']} memory + {cache['disk_hits']} disk hits, "
+                  f"{cache['misses']} misses ({cache['hit_rate']:.0%})")
+        location_gate = getattr(self.image_generator, 'location_gate', None)
+        if location_gate:
+            gate = location_gate.stats()
+            print(f"🧮 Location gate: {gate['yes']} YES + {gate['no']} NO answered locally, "
+                  f"{gate['escalated']} escalated ({gate['local_rate']:.0%} local)")
+
+    def submit(self, text: str, alternatives: Sequence[str] = (), phrase_id: Optional[int] = None):
+        """Hand a recognized transcript to the pipeline (safe to call from any thread)"""
+        if not self._ready.is_set():
+            print(f"Pipeline not running, dropping: '{text}'")
+            return
+        if len(alternatives) > 1:
+            text = self.image_generator.choose_transcript(alternatives)
+        # Only finals of phrases with a partial in flight are keyed to it; the rest merge with their neighbours
+        keyed = phrase_id is not None and phrase_id in self._partial_keywords
+        extra = {'phrase_id': phrase_id, 'partial': False} if keyed else None
+        self.utterances.put(text, priority=self._utterance_priority(text), extra=extra)
+
+    def submit_partial(self, text: str, phrase_id: int):
+        """Hand over an interim hypothesis of a phrase still being spoken (recognizer thread)"""
+        if not self._ready.is_set() or not self.image_generator.has_location_keywords(text):
+            return  # Only partials that already name a place are worth starting on
+        keywords = self._location_keywords(text)
+        if keywords <= self._partial_keywords.get(phrase_id, frozenset()):
+            return  # Nothing new since the last partial of this phrase
+        self._partial_keywords[phrase_id] = keywords
+        while len(self._partial_keywords) > 16:
+            self._partial_keywords.popitem(last=False)
+        self.utterances.put(text, priority=1, extra={'phrase_id': phrase_id, 'partial': True})
+
+    def _location_keywords(self, text: str) -> frozenset:
+        return frozenset(match.keyword for match in self.image_generator.keywords.find(text))
+
+    def _utterance_priority(self, text: str) -> int:
+        """Utterances that look like they name a place are served first"""
+        return 1 if self.image_generator.has_location_keywords(text) else 0
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Number of items waiting in front of each stage"""
+        depths = {stage: (self.queues[stage].qsize() if stage in self.queues else 0) for stage in self.STAGES}
+        depths['transcript'] = len(self.utterances)
+        return depths
+
+    def utterance_stats(self) -> Dict[str, int]:
+        """Processed / merged / dropped utterance counters"""
+        return self.utterances.stats()
+
+    def is_busy(self) -> bool:
+        return any(depth > 0 for depth in self.queue_depths().values())
+
+    def format_queue_depths(self) -> str:
+        stats = self.utterance_stats()
+        depths = "  ".join(f"{stage}={depth}" for stage, depth in self.queue_depths().items())
+        jobs = self.generation_pool.stats()
+        report = (f"{depths} | utterances processed={stats['processed']} "
+                  f"merged={stats['merged']} dropped={stats['dropped']} | "
+                  f"jobs running={jobs['running']} queued={jobs['queued']} shelved={jobs['shelved']}")
+        if self.prefetcher:
+            prefetch = self.prefetcher.stats()
+            report += f" | prefetch hits={prefetch['hits']}/{prefetch['prefetched']}"
+        return report
+
+    def _warm_derivatives(self):
+        """Render missing projector derivatives of library images (background thread)"""
+        library = getattr(self.image_generator, 'library', None)
+        if not library or not getattr(self.qlab, 'derivatives', None):
+            return
+        for name in library.names():
+            if self._stopping.is_set():
+                return
+            entry = library.get(name)
+            if not entry or not os.path.exists(entry['path']):
+                continue
+            try:
+                self.qlab.prepare_image(entry['path'])
+            except Exception as e:
+                print(f"⚠️ Could not prepare projector copy of {name}: {e}")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        finally:
+            self.loop.close()
+
+    async def _main(self):
+        # Queues must be created inside the running loop (the transcript stage reads the UtteranceQueue instead)
+        self.queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in self.STAGES if stage != 'transcript'}
+        self._stop_event = asyncio.Event()
+
+        workers = [
+            asyncio.ensure_future(self._utterance_worker()),
+            asyncio.ensure_future(self._stage_worker('classify', self._classify_stage)),
+            asyncio.ensure_future(self._stage_worker('resolve', self._resolve_stage)),
+            asyncio.ensure_future(self._stage_worker('generate', self._generate_stage)),
+            asyncio.ensure_future(self._stage_worker('publish', self._publish_stage)),
+        ]
+        if self.prefetcher:
+            workers.append(asyncio.ensure_future(self._prefetch_worker()))
+        self._ready.set()
+
+        await self._stop_event.wait()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _stage_worker(self, stage: str, handler):
+        """Pull items for a stage and run its handler, one at a time"""
+        queue = self.queues[stage]
+        while True:
+            item = await queue.get()
+            try:
+                await handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Pipeline {stage} error: {e}")
+            finally:
+                queue.task_done()
+
+    async def _utterance_worker(self):
+        """Feed the transcript stage from the latest-wins utterance queue"""
+        while True:
+            utterance = await self.loop.run_in_executor(None, self.utterances.get, 0.5)
+            if not utterance:
+                continue
+            try:
+                await self._transcript_stage(utterance)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Pipeline transcript error: {e}")
+
+    async def _prefetch_worker(self):
+        """Use idle API capacity to generate likely next environments"""
+        while True:
+            await asyncio.sleep(2)
+            quiet_for = time.time() - self.last_heard_time
+            if self.is_busy() or self.generation_pool.active_count() or quiet_for < self.prefetch_idle_delay:
+                continue
+            try:
+                await self._run_blocking(self.prefetcher.maybe_prefetch)
+            except Exception as e:
+                print(f"Prefetch error: {e}")
+
+    def _put_latest(self, stage: str, item: dict):
+        """Enqueue without blocking, dropping the oldest item when the queue is full"""
+        queue = self.queues[stage]
+        if queue.full():
+            try:
+                dropped = queue.get_nowait()
+                queue.task_done()
+                print(f"⏭️ Dropping stale {stage} item: '{dropped['text']}'")
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(item)
+
+    async def _run_blocking(self, func, *args):
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+    async def _transcript_stage(self, item: dict):
+        text = item['text']
+
+        # Filter out very short phrases
+        if len(text.split()) < self.min_words:
+            print(f"Phrase too short, ignoring: '{text}'")
+            return
+
+        if self.rate_limit_reuse:
+            since_publish = item['heard_at'] - self.last_publish_time
+            if since_publish < self.min_interval:
+                print(f"Rate limited - waiting {self.min_interval - since_publish:.1f}s")
+                return
+
+        phrase_id = item.get('phrase_id')
+        if phrase_id is not None and not item['partial'] and self._covered_by_partial(item):
+            self._skip_final(item)
+            return
+
+        print(f"\n🎭 Heard{' (partial)' if item.get('partial') else ''}: '{text}'")
+        self.last_heard_time = time.time()
+        if item.get('partial'):
+            self.partials_used += 1
+            item['environment_found'] = self.loop.create_future()  # Settled by the classify stage
+            self._phrases[phrase_id] = {'text': normalize_transcript(text), 'keywords': self._location_keywords(text),
+                                        'environment': item['environment_found']}
+            while len(self._phrases) > 16:
+                self._phrases.popitem(last=False)
+        await self.queues['classify'].put(item)
+
+    def _covered_by_partial(self, item: dict) -> Optional[bool]:
+        """Whether a final transcript would only redo work started from a partial of the same phrase.
+
+        Never waits: None while the partial is still being classified. The
+        classify stage runs in order, so by the time the final gets there
+        the partial's answer is in.
+        """
+        partial = self._phrases.get(item['phrase_id'])
+        if not partial:
+            return False
+        if normalize_transcript(item['text']) == partial['text']:
+            return True
+        if not partial['environment'].done():
+            return None
+        # Re-run only if the partial found no location, or the rest of the line names another place
+        environment = partial['environment'].result()
+        return environment is not None and self._location_keywords(item['text']) <= partial['keywords']
+
+    def _skip_final(self, item: dict):
+        self.finals_skipped += 1
+        print(f"⏩ Already handled from the partial transcript: '{item['text']}'")
+
+    async def _classify_stage(self, item: dict):
+        if item.get('phrase_id') is not None and not item['partial'] and self._covered_by_partial(item):
+            self._skip_final(item)
+            return
+        classification = None
+        try:
+            classification = await self._run_blocking(self.image_generator.classify_speech, item['text'])
+        finally:
+            found = item.get('environment_found')
+            if found and not found.done():
+                found.set_result(classification['environment_name'] if classification else None)
+        if self.prefetcher:
+            self.prefetcher.observe(item['text'], classification['environment_name'] if classification else None)
+        if not classification:
+            return
+        item.update(classification)
+        await self.queues['resolve'].put(item)
+
+    async def _resolve_stage(self, item: dict):
+        if self.prefetcher:
+            self.prefetcher.record_request(item['environment_name'])
+        existing_path = await self._run_blocking(self.image_generator.find_in_library, item['environment_name'])
+        if existing_path:
+            # The scene moved on - older generations must not be published over this one
+            self.generation_pool.supersede(item['environment_name'])
+            item['image_path'] = existing_path
+            item['was_reused'] = True
+            await self.queues['publish'].put(item)
+            return
+
+        # Newer environments win over generations still waiting for the worker
+        self._put_latest('generate', item)
+
+    async def _generate_stage(self, item: dict):
+        time_since_last = time.time() - self.last_generation_time
+        if time_since_last < self.min_interval:
+            print(f"🕐 Rate limited - waiting {self.min_interval - time_since_last:.1f}s before generating new image")
+            return
+
+        job = self.generation_pool.submit(item['text'], item['environment_name'], item.get('prompt'))
+        if job.id in self._awaited_jobs:
+            return  # Already generating this environment
+
+        self.last_generation_time = time.time()
+        self._awaited_jobs.add(job.id)
+        asyncio.ensure_future(self._await_generation(job, item))
+
+    async def _await_generation(self, job: GenerationJob, item: dict):
+        """Wait for a generation job without blocking the generate stage"""
+        try:
+            await asyncio.wrap_future(job.future)
+        except Exception as e:
+            print(f"Generation job error: {e}")
+            return
+        finally:
+            self._awaited_jobs.discard(job.id)
+
+        if job.state != GenerationJob.RUNNING:
+            return  # Failed, cancelled or already shelved
+
+        item['job'] = job
+        item['image_path'] = job.image_path
+        item['was_reused'] = False
+        item['generation_time'] = job.generation_time
+        await self.queues['publish'].put(item)
+
+    async def _publish_stage(self, item: dict):
+        job = item.get('job')
+        try:
+            await self._publish(item)
+        finally:
+            # Whatever went wrong, a job that didn't make it to QLab must not stay active
+            if job and job.is_active:
+                self.generation_pool.mark_shelved(job)
+
+    async def _publish(self, item: dict):
+        image_path = item['image_path']
+        job = item.get('job')
+
+        if job and not job.publish:
+            return  # Demoted after it finished - shelved
+
+        if item['was_reused']:
+            print("⚡ Environment loaded instantly (from library)")
+        else:
+            mode_text = "fast mode" if self.image_generator.fast_mode else "high quality"
+            print(f"⚡ Generated in {item['generation_time']:.1f}s ({mode_text})")
+
+        success = await self._run_blocking(self.qlab.create_and_start_video_cue, image_path, self.cue_duration)
+        if not success:
+            print("❌ Failed to update QLab")
+            return
+
+        if job:
+            self.generation_pool.mark_published(job)
+        print("✅ Background updated in QLab")
+        print(f"⏱️ Heard → on stage in {time.time() - item['heard_at']:.1f}s")
+        self.last_publish_time = item['heard_at']
+
+        # Add ambient sound for the environment (if enabled)
+        if self.sound_generator:
+            environment_name = os.path.basename(image_path).replace('.png', '')
+            await self._run_blocking(self.sound_generator.create_ambient_sound_cue, environment_name)
+
+        if self.on_published:
+            self.on_published(image_path, item['was_reused'])
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Predictive prefetch of likely next environments.
+
+While a scene plays, the prefetcher looks at the current environment and
+recent transcripts, predicts where the scene is likely to go next
+(kitchen → restaurant, office → meeting room, ...) and generates missing
+environments into the library while the API is otherwise idle. Prefetched
+images are shelved, never published, so when a predicted location is
+named the cue comes straight from the library.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Where scenes commonly go from each environment, most likely first
+FOLLOW_ON_ENVIRONMENTS = {
+    'kitchen': ['restaurant', 'dining_room', 'grocery_store'],
+    'restaurant': ['kitchen', 'bar', 'street'],
+    'italian_restaurant': ['kitchen', 'wine_cellar', 'street'],
+    'coffee_shop': ['office', 'park', 'bookstore'],
+    'bar': ['street', 'nightclub', 'restaurant'],
+    'office': ['meeting_room', 'break_room', 'elevator'],
+    'meeting_room': ['office', 'break_room'],
+    'park': ['playground', 'picnic_area', 'street'],
+    'beach': ['boardwalk', 'ocean', 'beach_bar'],
+    'hospital': ['emergency_room', 'operating_room', 'waiting_room'],
+    'emergency_room': ['operating_room', 'waiting_room'],
+    'school': ['classroom', 'cafeteria', 'gym'],
+    'classroom': ['hallway', 'cafeteria', 'principal_office'],
+    'castle': ['throne_room', 'dungeon', 'castle_courtyard'],
+    'castle_courtyard': ['throne_room', 'castle'],
+    'forest': ['dark_forest', 'campsite', 'cabin'],
+    'airport': ['airplane_cabin', 'hotel', 'taxi'],
+    'hotel': ['hotel_room', 'lobby', 'pool'],
+    'spaceship': ['spaceship_bridge', 'alien_planet'],
+    'police_station': ['interrogation_room', 'courtroom', 'jail_cell'],
+    'courtroom': ['jail_cell', 'lawyer_office'],
+    'evil_lair': ['dungeon', 'laboratory'],
+    'grocery_store': ['kitchen', 'parking_lot'],
+    'white_house_office': ['press_room', 'situation_room'],
+}
+
+def _tokens(text: str) -> set:
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+class EnvironmentPrefetcher:
+    def __init__(self, image_generator, generation_pool, budget: int = 10, max_candidates: int = 3,
+                 transcript_window: int = 6):
+        self.image_generator = image_generator
+        self.generation_pool = generation_pool
+        self.budget = budget  # Maximum prefetch generations per session
+        self.max_candidates = max_candidates
+        self.recent_transcripts = deque(maxlen=transcript_window)
+        self.current_environment = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.spent = 0
+        self.prefetched: Dict[str, float] = {}  # environment -> time it was prefetched
+        self.hits = 0  # Prefetched environments later requested
+        self.predictions = 0
+
+    def observe(self, text: str, environment_name: Optional[str] = None):
+        """Record what was just said (and the environment it resolved to)"""
+        with self._lock:
+            self.recent_transcripts.append(text)
+            if environment_name:
+                self.current_environment = environment_name
+
+    def record_request(self, environment_name: str):
+        """A live cue asked for this environment - count it if we prefetched it"""
+        with self._lock:
+            if environment_name in self.prefetched:
+                self.hits += 1
+                print(f"🎯 Prefetch hit: {environment_name}")
+                del self.prefetched[environment_name]
+
+    def predict(self) -> List[str]:
+        """Likely next environments, best first"""
+        with self._lock:
+            current = self.current_environment
+            recent_tokens = set()
+            for text in self.recent_transcripts:
+                recent_tokens |= _tokens(text)
+
+        if not current:
+            return []
+
+        scores: Dict[str, float] = {}
+        follow_ons = FOLLOW_ON_ENVIRONMENTS.get(current, [])
+        if not follow_ons:
+            # Fall back to any mapping keyed by a word of the current environment (e.g. "fancy_kitchen")
+            for word in current.split('_'):
+                follow_ons = follow_ons or FOLLOW_ON_ENVIRONMENTS.get(word, [])
+
+        for rank, candidate in enumerate(follow_ons):
+            scores[candidate] = scores.get(candidate, 0) + 1.0 / (rank + 1)
+
+        # Follow-ons whose words are already being said in the scene get a boost
+        for candidate in scores:
+            overlap = len(set(candidate.split('_')) & recent_tokens)
+            scores[candidate] += 0.5 * overlap
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [name for name in ranked if name != current][:self.max_candidates]
+
+    def maybe_prefetch(self) -> Optional[str]:
+        """Start one prefetch generation if there is budget left; returns the environment started"""
+        if self.spent >= self.budget:
+            return None
+
+        for candidate in self.predict():
+            if candidate in self.prefetched or self.image_generator.has_environment(candidate):
+                continue
+
+            with self._lock:
+                self.spent += 1
+                self.predictions += 1
+                self.prefetched[candidate] = time.time()
+
+            print(f"🔮 Prefetching likely next environment: {candidate} ({self.spent}/{self.budget} budget)")
+            self.generation_pool.submit(candidate.replace('_', ' '), candidate, publish=False)
+            return candidate
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'prefetched': self.predictions,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.predictions if self.predictions else 0.0,
+                'budget_left': self.budget - self.spent
+            }
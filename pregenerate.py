@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+"""
+Show-plan pre-generation for Improv AI.
+
+Fills generated_images/ before the show with the settings audiences are
+likely to shout, so they load instantly from the library during the run.
+Progress is saved after every environment, so an interrupted run picks up
+where it left off (--fresh starts over). Environments evicted by the
+library quota are regenerated from the prompt logged when they were evicted.
+
+Usage:
+  python pregenerate.py restaurant park office castle
+  python pregenerate.py --file show_plan.txt --workers 4
+  python pregenerate.py --suggestions "a haunted lighthouse" "the DMV"
+  python pregenerate.py --evicted
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from image_generator import AIImageGenerator
+from projector_derivatives import ProjectorDerivatives, parse_resolution
+from library_quota import read_eviction_log
+
+STATE_FILENAME = ".pregenerate_state.json"
+
+class RateLimiter:
+    """Blocking limiter allowing at most `per_minute` calls in any rolling minute"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.time()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+class ShowPlanPregenerator:
+    def __init__(self, image_generator: AIImageGenerator, workers: int = 3, images_per_minute: float = 5,
+                 derivatives: Optional[ProjectorDerivatives] = None):
+        self.image_generator = image_generator
+        self.derivatives = derivatives  # Also pre-render projector-size copies
+        self.workers = workers
+        self.rate_limiter = RateLimiter(images_per_minute)
+        self.state_path = os.path.join(image_generator.images_dir, STATE_FILENAME)
+        self.state = self._load_state()
+        self._lock = threading.Lock()
+
+    def _load_state(self) -> dict:
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path) as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable progress file: {e}")
+        return {'completed': [], 'failed': []}
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.part"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def reset(self):
+        self.state = {'completed': [], 'failed': []}
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def forget(self, names: List[str]):
+        """Generate these again even if an earlier run completed them (e.g. evicted since)"""
+        self.state['completed'] = [name for name in self.state['completed'] if name not in names]
+
+    def resolve_names(self, items: List[str], suggestions: bool = False) -> List[tuple]:
+        """Turn plan entries into (environment_name, description, prompt) triples, without duplicates"""
+        resolved = []
+        seen = set()
+        for item in items:
+            if suggestions:
+                name = self.image_generator._extract_environment_name(item)
+                description = item
+            else:
+                name = self.image_generator._clean_environment_name(item.replace(' ', '_'))
+                description = name.replace('_', ' ')
+            if name and name not in seen:
+                seen.add(name)
+                resolved.append((name, description, None))
+        return resolved
+
+    def run(self, plan: List[tuple]) -> dict:
+        """Generate every missing environment in the plan"""
+        todo = []
+        for name, description, prompt in plan:
+            if self.image_generator.has_environment(name):
+                print(f"✅ Already in library: {name}")
+                self._prepare_derivative(name)
+                continue
+            if name in self.state['completed']:
+                print(f"⏭️ Done in an earlier run: {name}")
+                continue
+            todo.append((name, description, prompt))
+
+        if not todo:
+            print("🎉 Library already covers the whole show plan")
+            return self.summary(plan)
+
+        print(f"🎨 Pre-generating {len(todo)} environments with {self.workers} workers...")
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pregenerate")
+        futures = {executor.submit(self._generate_one, name, description, prompt): name
+                   for name, description, prompt in todo}
+        try:
+            for future in as_completed(futures):
+                name = futures[future]
+                success = future.result()
+                with self._lock:
+                    if name in self.state['failed']:
+                        self.state['failed'].remove(name)
+                    self.state['completed' if success else 'failed'].append(name)
+                    self._save_state()
+        except KeyboardInterrupt:
+            print("\n⏸️ Interrupted - progress saved, run again to resume")
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+            raise
+        executor.shutdown()
+        return self.summary(plan)
+
+    def _generate_one(self, name: str, description: str, prompt: Optional[str] = None) -> bool:
+        self.rate_limiter.acquire()
+        if self.image_generator.generate_environment(description, name, prompt) is None:
+            return False
+        self._prepare_derivative(name)
+        return True
+
+    def _prepare_derivative(self, name: str):
+        entry = self.image_generator.library.get(name)
+        if self.derivatives and entry:
+            self.derivatives.for_cue(entry['path'])
+
+    def summary(self, plan: List[tuple]) -> dict:
+        names = [name for name, _, _ in plan]
+        ready = [name for name in names if self.image_generator.has_environment(name)]
+        failed = [name for name in names if name in self.state['failed'] and name not in ready]
+        return {'planned': len(names), 'ready': len(ready), 'failed': failed}
+
+def read_plan_file(path: str) -> List[str]:
+    """One environment or suggestion per line; blank lines and # comments are ignored"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def main():
+    parser = argparse.ArgumentParser(description='🎭 Improv AI - pre-generate the environment library for a show')
+    parser.add_argument('items', nargs='*', help='Environment names (or suggestions with --suggestions)')
+    parser.add_argument('--file', help='Show plan file with one entry per line')
+    parser.add_argument('--suggestions', action='store_true',
+                        help='Entries are audience suggestions - extract environment names with the LLM first')
+    parser.add_argument('--workers', type=int, default=3, help='Concurrent generations (default: 3)')
+    parser.add_argument('--rate-limit', type=float, default=5, metavar='PER_MINUTE',
+                        help='Maximum image requests per minute, to stay inside the API limit (default: 5)')
+    parser.add_argument('--fast', action='store_true', help='Use DALL-E 2 instead of DALL-E 3')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Ignore saved progress and start over (otherwise environments done in an earlier run are skipped)')
+    parser.add_argument('--evicted', action='store_true',
+                        help='Also regenerate environments evicted by the library quota')
+    parser.add_argument('--projector', type=parse_resolution, metavar='WIDTHxHEIGHT',
+                        help='Projector resolution for pre-rendered cue images (default: $PROJECTOR_RESOLUTION or 1920x1080)')
+
+    args = parser.parse_args()
+
+    items = list(args.items)
+    if args.file:
+        items.extend(read_plan_file(args.file))
+    evicted = read_eviction_log() if args.evicted else []
+    if not items and not evicted:
+        parser.error("give environment names, --file or --evicted")
+
+    load_dotenv()
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        print("Error: OPENAI_API_KEY not found in .env file")
+        sys.exit(1)
+
+    generator = AIImageGenerator(api_key, fast_mode=args.fast)
+    pregenerator = ShowPlanPregenerator(generator, workers=args.workers, images_per_minute=args.rate_limit,
+                                        derivatives=ProjectorDerivatives(args.projector))
+    if args.fresh:
+        pregenerator.reset()
+
+    plan = pregenerator.resolve_names(items, suggestions=args.suggestions)
+    planned = {name for name, _, _ in plan}
+    # Evicted environments come back with the prompt they were made from
+    plan += [(record['name'], record['name'].replace('_', ' '), record.get('prompt'))
+             for record in evicted if record['name'] not in planned]
+    pregenerator.forget([record['name'] for record in evicted])
+    try:
+        summary = pregenerator.run(plan)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    print(f"\n📚 {summary['ready']}/{summary['planned']} planned environments ready")
+    if summary['failed']:
+        print(f"❌ Failed (run again to retry): {', '.join(summary['failed'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""
+Projector-resolution derivatives of library images.
+
+Library PNGs are 1024x1024 or 1792x1024 and slow to decode. Each one is
+rendered once to the projector's resolution and aspect as a baseline JPEG
+in generated_images/projector/, named after the content hash of the
+original so a regenerated image never reuses a stale derivative. QLab is
+handed the derivative instead of the original.
+
+The projector resolution comes from PROJECTOR_RESOLUTION (e.g. "1920x1080")
+or the constructor, defaulting to 1920x1080.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from image_ingest import write_atomic
+
+DEFAULT_RESOLUTION = (1920, 1080)
+FIT_MODES = ("cover", "contain")
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    """'1920x1080' -> (1920, 1080)"""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Resolution must look like 1920x1080, got: {value}")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Resolution must be positive, got: {value}")
+    return width, height
+
+class ProjectorDerivatives:
+    def __init__(self, resolution: Optional[Tuple[int, int]] = None, fit: str = "cover",
+                 cache_dir: str = os.path.join("generated_images", "projector"), quality: int = 90):
+        if fit not in FIT_MODES:
+            raise ValueError(f"Unknown fit mode: {fit}")
+        if resolution is None:
+            env_resolution = os.getenv('PROJECTOR_RESOLUTION')
+            resolution = parse_resolution(env_resolution) if env_resolution else DEFAULT_RESOLUTION
+        self.width, self.height = resolution
+        self.fit = fit  # cover: crop to fill the screen; contain: letterbox
+        self.cache_dir = cache_dir
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._hashes: Dict[str, tuple] = {}  # path -> (size, mtime_ns, content hash)
+        self._render_locks: Dict[str, threading.Lock] = {}  # derivative path -> lock, so it is rendered once
+
+    def content_hash(self, image_path: str) -> str:
+        """SHA-1 of the image bytes, memoized while the file is unchanged"""
+        stat = os.stat(image_path)
+        with self._lock:
+            cached = self._hashes.get(image_path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+
+        digest = hashlib.sha1()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()[:16]
+        with self._lock:
+            self._hashes[image_path] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        return content_hash
+
+    def _prefix(self, image_path: str) -> str:
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        return f"{stem}_{self.width}x{self.height}_{self.fit}_"
+
+    def derivative_path(self, image_path: str) -> str:
+        return os.path.join(self.cache_dir, f"{self._prefix(image_path)}{self.content_hash(image_path)}.jpg")
+
+    def _render(self, image_path: str) -> bytes:
+        size = (self.width, self.height)
+        with Image.open(image_path) as image:
+            image = image.convert('RGB')
+            if self.fit == "cover":
+                rendered = ImageOps.fit(image, size, Image.LANCZOS)
+            else:
+                rendered = ImageOps.pad(image, size, Image.LANCZOS, color=(0, 0, 0))
+        buffer = io.BytesIO()
+        rendered.save(buffer, format='JPEG', quality=self.quality, optimize=True)
+        return buffer.getvalue()
+
+    def _remove_stale(self, image_path: str, keep: str):
+        prefix = self._prefix(image_path)
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            if filename.startswith(prefix) and path != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def ensure(self, image_path: str) -> str:
+        """Path of the projector derivative, rendering it if it is missing or stale"""
+        derivative = self.derivative_path(image_path)
+        if os.path.exists(derivative):
+            return derivative
+
+        with self._lock:
+            render_lock = self._render_locks.setdefault(derivative, threading.Lock())
+        with render_lock:
+            if os.path.exists(derivative):
+                return derivative  # Another thread (warm-up or a cue) just rendered it
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_atomic(derivative, [self._render(image_path)])
+            self._remove_stale(image_path, keep=derivative)
+        print(f"🖼️ Projector derivative ready: {os.path.basename(derivative)}")
+        return derivative
+
+    def for_cue(self, image_path: str) -> str:
+        """Derivative to play, falling back to the original if it can't be rendered"""
+        try:
+            return self.ensure(image_path)
+        except Exception as e:
+            print(f"⚠️ Using full-size image ({e})")
+            return image_path
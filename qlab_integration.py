@@ -1,13 +1,23 @@
 import subprocess
 import os
-from typing import Optional
+from typing import Optional, Tuple
+from projector_derivatives import ProjectorDerivatives
 
 class QLab:
-    def __init__(self, workspace_name: Optional[str] = None, auto_stop_previous: bool = True):
+    def __init__(self, workspace_name: Optional[str] = None, auto_stop_previous: bool = True,
+                 projector_resolution: Optional[Tuple[int, int]] = None, use_derivatives: bool = True):
         self.workspace_name = workspace_name
         self.auto_stop_previous = auto_stop_previous
         self.last_cue_id = None
         self.default_backdrop_id = None
+        # Pre-scaled JPEGs at projector resolution decode much faster than full-size PNGs
+        self.derivatives = ProjectorDerivatives(projector_resolution) if use_derivatives else None
+    
+    def prepare_image(self, image_path: str) -> str:
+        """Render the projector derivative ahead of the cue (returns the path QLab will play)"""
+        if not self.derivatives:
+            return image_path
+        return self.derivatives.for_cue(image_path)
     
     def send_image_to_qlab(self, image_path: str, cue_name: Optional[str] = None) -> bool:
         """Send image to QLab using AppleScript"""
@@ -87,7 +97,7 @@ class QLab:
             print(f"Could not communicate with QLab: {e}")
             return False
         
-        abs_image_path = os.path.abspath(image_path)
+        abs_image_path = os.path.abspath(self.prepare_image(image_path))
         filename = os.path.basename(image_path)
         
         # Working approach with optional previous cue stopping
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+"""
+Embedding-based semantic lookup over the environment library.
+
+Each library environment (name plus stored prompt) is embedded once and
+kept as a row of a NumPy matrix. A new environment name is embedded and
+compared against all rows with a single matrix product, so near-synonyms
+("cafe", "coffee_place") reuse an existing image ("coffee_shop") instead
+of paying for a new generation.
+
+Embedding providers are pluggable. The OpenAI provider gives real semantic
+similarity; the hashing provider runs locally with no network and is used
+as the fallback when the API is unreachable.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+class EmbeddingProvider(ABC):
+    name = "base"
+    default_threshold = 0.8
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return an (n, dim) float32 matrix of L2-normalized vectors"""
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    name = "openai"
+    default_threshold = 0.72
+
+    def __init__(self, client, model: str = "text-embedding-3-small"):
+        self.client = client
+        self.model = model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return _normalize(vectors)
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Local, offline embedding: hashed words and character trigrams"""
+    name = "hashing"
+    default_threshold = 0.75  # Lexical only - stay strict so "thai" doesn't reuse "italian"
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"[a-z0-9]+", text.lower())
+            features = list(words)
+            for word in words:
+                padded = f"#{word}#"
+                features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+            for feature in features:
+                vectors[row, zlib.crc32(feature.encode()) % self.dim] += 1.0
+        return _normalize(vectors)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _describe(name: str, prompt: Optional[str]) -> str:
+    """Text embedded for a library entry: its name, plus the start of its prompt"""
+    text = name.replace('_', ' ')
+    if prompt:
+        text += f" - {prompt[:120]}"
+    return text
+
+class SemanticLibraryIndex:
+    def __init__(self, library, provider: EmbeddingProvider, threshold: Optional[float] = None,
+                 fallback: Optional[EmbeddingProvider] = None):
+        self.library = library
+        self.provider = provider
+        self.fallback = fallback if fallback is not None else HashingEmbeddingProvider()
+        self.threshold = threshold
+        self.names: List[str] = []
+        self.keys: List[str] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self.build()
+
+    @property
+    def cache_path(self) -> str:
+        return os.path.join(self.library.images_dir, f"embeddings_{self.provider.name}.npz")
+
+    @property
+    def active_threshold(self) -> float:
+        return self.threshold if self.threshold is not None else self.provider.default_threshold
+
+    def build(self):
+        """Load cached vectors and embed any library entries that are new or changed"""
+        entries = [self.library.get(name) for name in self.library.names()]
+        texts = [_describe(entry['name'], entry.get('prompt')) for entry in entries]
+        keys = [hashlib.sha1(text.encode()).hexdigest() for text in texts]
+
+        cached = {}
+        if os.path.exists(self.cache_path):
+            try:
+                data = np.load(self.cache_path)
+                cached = dict(zip(data['keys'].tolist(), data['vectors']))
+            except Exception as e:
+                print(f"⚠️ Ignoring unreadable embedding cache: {e}")
+
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            try:
+                vectors = self.provider.embed([texts[i] for i in missing])
+            except Exception as e:
+                if self.provider is self.fallback:
+                    raise
+                print(f"⚠️ {self.provider.name} embeddings unavailable ({e}) - using local {self.fallback.name} embeddings")
+                self.provider = self.fallback
+                return self.build()
+            for i, vector in zip(missing, vectors):
+                cached[keys[i]] = vector
+
+        with self._lock:
+            self.names = [entry['name'] for entry in entries]
+            self.keys = keys
+            self.matrix = np.stack([cached[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+        self._save()
+
+    def _save(self):
+        with self._lock:
+            if not self.keys:
+                return
+            tmp_path = f"{self.cache_path}.{os.getpid()}.part.npz"  # Unique per instance sharing the library
+            np.savez(tmp_path, keys=np.array(self.keys), vectors=self.matrix)
+            os.replace(tmp_path, self.cache_path)
+
+    def add(self, name: str):
+        """Index a newly generated environment"""
+        entry = self.library.get(name)
+        if not entry:
+            return
+        text = _describe(name, entry.get('prompt'))
+        try:
+            vector = self.provider.embed([text])[0]
+        except Exception as e:
+            print(f"⚠️ Could not embed {name}: {e}")
+            return
+
+        with self._lock:
+            if name in self.names:
+                row = self.names.index(name)
+                self.matrix[row] = vector
+                self.keys[row] = hashlib.sha1(text.encode()).hexdigest()
+            else:
+                self.names.append(name)
+                self.keys.append(hashlib.sha1(text.encode()).hexdigest())
+                self.matrix = np.vstack([self.matrix, vector[None, :]]) if self.matrix.size else vector[None, :]
+        self._save()
+
+    def remove(self, name: str):
+        with self._lock:
+            if name not in self.names:
+                return
+            row = self.names.index(name)
+            del self.names[row]
+            del self.keys[row]
+            self.matrix = np.delete(self.matrix, row, axis=0)
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[str, float]]:
+        """Top-k library environments by cosine similarity"""
+        with self._lock:
+            if not self.names:
+                return []
+            names, matrix = list(self.names), self.matrix
+
+        try:
+            query_vector = self.provider.embed([query.replace('_', ' ')])[0]
+        except Exception as e:
+            if self.provider is self.fallback:
+                print(f"⚠️ Semantic lookup unavailable: {e}")
+                return []
+            # Venue network dropped - switch the whole index to local embeddings
+            print(f"⚠️ {self.provider.name} embeddings unavailable ({e}) - switching to local {self.fallback.name} embeddings")
+            self.provider = self.fallback
+            self.build()
+            return self.search(query, k)
+
+        scores = matrix @ query_vector
+        k = min(k, len(names))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(names[i], float(scores[i])) for i in top]
+
+    def best_match(self, query: str) -> Optional[Tuple[str, float]]:
+        """Closest environment if it clears the similarity threshold"""
+        results = self.search(query, k=1)
+        if results and results[0][1] >= self.active_threshold:
+            return results[0]
+        return None
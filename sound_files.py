@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+In-memory index of the ambient audio files in generated_sounds/.
+
+The directory is scanned once at startup into a dict keyed by sound name
+("chinese_restaurant_ambient.wav" -> "chinese_restaurant"), so finding a
+file is a dict lookup instead of probing every extension on disk. The index
+follows the directory through watchdog when it is installed; otherwise the
+directory mtime is checked at most every poll_interval seconds on lookup.
+
+Lookups take a list of candidate names, most specific first (see
+SoundMappingResolver.candidates), and return the first one with a file.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional - fall back to mtime polling
+    Observer = None
+    FileSystemEventHandler = object
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.m4a', '.aiff')  # Preferred first
+AMBIENT_SUFFIX = "_ambient"
+
+class _DirtyHandler(FileSystemEventHandler):
+    def __init__(self, index: "SoundFileIndex"):
+        self.index = index
+
+    def on_any_event(self, event):
+        self.index.invalidate()
+
+class SoundFileIndex:
+    def __init__(self, sounds_dir: str = "generated_sounds", poll_interval: float = 2.0, watch: bool = True):
+        self.sounds_dir = sounds_dir
+        self.poll_interval = poll_interval
+        self.files: Dict[str, str] = {}  # sound name -> path
+        self._memo: Dict[tuple, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._dir_mtime = None
+        self._checked_at = 0.0
+        self._observer = None
+
+        if watch and Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_DirtyHandler(self), sounds_dir, recursive=False)
+                self._observer.start()
+            except Exception as e:
+                print(f"⚠️ Sound folder watcher unavailable, polling instead: {e}")
+                self._observer = None
+        self._refresh()
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _rank(self, filename: str) -> tuple:
+        stem, extension = os.path.splitext(filename)
+        return (not stem.endswith(AMBIENT_SUFFIX), AUDIO_EXTENSIONS.index(extension.lower()))
+
+    def _scan(self):
+        files: Dict[str, str] = {}
+        try:
+            entries = sorted(os.listdir(self.sounds_dir))
+        except FileNotFoundError:
+            entries = []
+        for filename in entries:
+            stem, extension = os.path.splitext(filename)
+            if extension.lower() not in AUDIO_EXTENSIONS:
+                continue
+            name = stem[:-len(AMBIENT_SUFFIX)] if stem.endswith(AMBIENT_SUFFIX) else stem
+            name = name.lower()
+            current = files.get(name)
+            if current is None or self._rank(filename) < self._rank(os.path.basename(current)):
+                files[name] = os.path.join(self.sounds_dir, filename)
+        self.files = files
+        self._memo = {}
+
+    def _refresh(self):
+        """Rescan when the watcher flagged a change or (without a watcher) the folder mtime moved"""
+        with self._lock:
+            if self._observer is None:
+                now = time.monotonic()
+                if now - self._checked_at >= self.poll_interval:
+                    self._checked_at = now
+                    try:
+                        mtime = os.stat(self.sounds_dir).st_mtime_ns
+                    except FileNotFoundError:
+                        mtime = None
+                    if mtime != self._dir_mtime:
+                        self._dir_mtime = mtime
+                        self._dirty = True
+            if self._dirty:
+                self._dirty = False
+                self._scan()
+
+    def find(self, candidates: List[str]) -> Optional[str]:
+        """Path of the first candidate name that has a file, or None"""
+        self._refresh()
+        key = tuple(candidates)
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = next((self.files[name] for name in candidates if name in self.files), None)
+            return self._memo[key]
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+            self._observer = None
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""
+Table-driven resolver from environment names to ambient sounds.
+
+Sounds, the words that select them and their priorities live in
+sound_mappings.json. At load time every rule word (plus the keyword engine
+categories a rule pulls in, e.g. all cuisines for "restaurant") goes into a
+token index, so resolving a name is a handful of dict lookups on its words
+and word pairs instead of substring scans. When several rules match, the
+highest priority wins - "pirate_ship" is a ship deck, "spaceship" is a
+spaceship, and "hospital_kitchen" is a kitchen regardless of table order.
+Results are memoized per environment name.
+
+candidates() lists the sound file names to try for an environment, most
+specific first: the environment itself, its cuisine's restaurant, the
+cuisine, then the resolved sound ("szechuan_noodle_place" ->
+szechuan_noodle_place, chinese_restaurant, chinese, restaurant).
+
+Check how the whole library maps with:
+  python sound_mapping.py
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from keyword_engine import get_keyword_engine
+from library_manifest import LibraryManifest
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sound_mappings.json")
+
+def name_tokens(environment_name: str) -> List[str]:
+    """Words of an environment name plus adjacent word pairs ("space station")"""
+    words = re.findall(r"[a-z0-9é]+", environment_name.lower())
+    words += [word[:-1] for word in words if len(word) > 3 and word.endswith('s') and not word.endswith('ss')]
+    pairs = [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return words + pairs
+
+class SoundMappingResolver:
+    def __init__(self, data: dict):
+        self.sounds: Dict[str, str] = dict(data['sounds'])
+        self.cuisine_aliases: Dict[str, str] = {key.lower(): value for key, value in data.get('cuisine_aliases', {}).items()}
+        self.index: Dict[str, Tuple[int, str]] = {}  # token -> (priority, sound) of the strongest rule using it
+        self._memo: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+        keywords = get_keyword_engine()
+        for rule in data['rules']:
+            if rule['sound'] not in self.sounds:
+                raise ValueError(f"Rule refers to unknown sound '{rule['sound']}'")
+            words = list(rule.get('tokens', []))
+            if rule.get('categories'):
+                words += keywords.keywords_in(*rule['categories'])
+            for word in words:
+                self._index(word, int(rule['priority']), rule['sound'])
+
+        # A sound's own name always selects it ("coffee_shop", "ship_deck")
+        for sound in self.sounds:
+            self._index(sound, self.index.get(sound.replace('_', ' '), (0, sound))[0], sound)
+
+    def _index(self, word: str, priority: int, sound: str):
+        token = " ".join(re.findall(r"[a-z0-9é]+", word.lower()))
+        if token and priority >= self.index.get(token, (-1, None))[0]:
+            self.index[token] = (priority, sound)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_PATH) -> "SoundMappingResolver":
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def resolve(self, environment_name: str) -> Optional[str]:
+        """Sound key for an environment name, or None"""
+        with self._lock:
+            if environment_name in self._memo:
+                return self._memo[environment_name]
+
+        best = None
+        for token in name_tokens(environment_name):
+            hit = self.index.get(token)
+            if hit and (best is None or hit[0] > best[0]):
+                best = hit
+        sound = best[1] if best else None
+
+        with self._lock:
+            self._memo[environment_name] = sound
+        return sound
+
+    def describe(self, environment_name: str) -> Optional[str]:
+        """Sound description for an environment name, or None"""
+        sound = self.resolve(environment_name)
+        return self.sounds[sound] if sound else None
+
+    def resolve_many(self, environment_names: Iterable[str]) -> Dict[str, Optional[str]]:
+        return {name: self.resolve(name) for name in environment_names}
+
+    def cuisine(self, environment_name: str) -> Optional[str]:
+        """Cuisine named in an environment ("szechuan_noodle_place" -> "chinese"), or None"""
+        for match in get_keyword_engine().find(environment_name):
+            if 'cuisine' in match.categories or match.keyword in self.cuisine_aliases:
+                return self.cuisine_aliases.get(match.keyword, match.keyword).replace(' ', '_')
+        return None
+
+    def candidates(self, environment_name: str) -> List[str]:
+        """Sound names to look for, most specific first"""
+        names = [environment_name.lower()]
+        cuisine = self.cuisine(environment_name)
+        if cuisine:
+            names += [f"{cuisine}_restaurant", cuisine]
+        sound = self.resolve(environment_name)
+        if sound:
+            names.append(sound)
+        return list(dict.fromkeys(names))
+
+_default_resolver: Optional[SoundMappingResolver] = None
+_default_lock = threading.Lock()
+
+def get_sound_resolver() -> SoundMappingResolver:
+    """Process-wide resolver loaded from sound_mappings.json"""
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            _default_resolver = SoundMappingResolver.from_file()
+        return _default_resolver
+
+def main():
+    resolver = get_sound_resolver()
+    names = LibraryManifest("generated_images").names()
+    if not names:
+        print("📭 Library is empty")
+        return
+
+    mapping = resolver.resolve_many(names)
+    by_sound: Dict[str, List[str]] = {}
+    for name, sound in mapping.items():
+        by_sound.setdefault(sound or "(none)", []).append(name)
+
+    print(f"🎵 Ambient sounds for {len(names)} environment(s):")
+    for sound in sorted(by_sound, key=lambda key: (key == "(none)", key)):
+        print(f"🎶 {sound} ({len(by_sound[sound])}): {', '.join(sorted(by_sound[sound]))}")
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,46 @@ import pyaudio
 import threading
 import queue
 import time
+import os
+from collections import deque
 from typing import Callable, Optional
+from asr_backends import ASRBackend, create_backend
+from voice_activity import VoiceActivityDetector, load_profile
 
 class RealTimeSpeechRecognizer:
-    def __init__(self, callback: Callable[[str], None]):
-        self.callback = callback
+    def __init__(self, callback: Callable[..., None], max_pending_audio: int = 8,
+                 backend: Optional[ASRBackend] = None, record_dir: Optional[str] = None,
+                 partial_callback: Optional[Callable[[str, int], None]] = None, partial_interval: float = 1.0,
+                 vad_profile: Optional[str] = "default"):
+        self.callback = callback  # callback(text, alternatives, phrase_id=...)
         self.recognizer = sr.Recognizer()
+        self.backend = backend or create_backend('google', self.recognizer)
+        self.record_dir = record_dir  # Save every phrase as .wav for benchmarking backends
+        self.recorded_phrases = 0
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
         self.microphone = sr.Microphone()
-        self.audio_queue = queue.Queue()
+        self.max_pending_audio = max_pending_audio
+        self.audio_queue = queue.Queue(maxsize=max_pending_audio)  # Bounded - old phrases are dropped
+        self.dropped_audio = 0
         self.stop_listening = None
         self.is_running = False
         self.error_count = 0
+        self.consecutive_errors = 0
+        self.phrase_time_limit = 15  # Even longer for theater dialogue
+        
+        # Phrases are cut by our own voice activity detector (None: speech_recognition's fixed pause)
+        self.vad_settings = load_profile(vad_profile) if vad_profile else None
+        self.vad = None
+        
+        # Streaming mode: phrases are recognized while still being spoken
+        self.partial_callback = partial_callback if self.vad_settings else None  # partial_callback(text, phrase_id)
+        self.partial_interval = partial_interval  # Seconds of new audio between partials (whole-phrase backends)
+        # Captured phrase events; past max_pending_audio finished phrases the oldest whole phrase is dropped
+        self.stream_events = deque()
+        self._stream_condition = threading.Condition()
+        if partial_callback and not self.vad_settings:
+            print("⚠️ Partial transcripts need voice activity endpointing - ignoring")
         
         # Enhanced recognizer settings for better quality
         self.recognizer.energy_threshold = 300  # Base energy threshold
@@ -36,18 +65,25 @@ class RealTimeSpeechRecognizer:
             return
         
         self.is_running = True
-        self.stop_listening = self.recognizer.listen_in_background(
-            self.microphone, 
-            self._audio_callback,
-            phrase_time_limit=15  # Even longer for theater dialogue
-        )
+        if self.vad_settings:
+            # Read the microphone ourselves: phrases end as soon as the VAD hears the line is over,
+            # and audio reaches the backend while the phrase goes on
+            self.capture_thread = threading.Thread(target=self._capture_audio, daemon=True)
+            self.capture_thread.start()
+            self.processing_thread = threading.Thread(target=self._process_stream)
+        else:
+            self.stop_listening = self.recognizer.listen_in_background(
+                self.microphone, 
+                self._audio_callback,
+                phrase_time_limit=self.phrase_time_limit
+            )
+            self.processing_thread = threading.Thread(target=self._process_audio)
         
         # Start processing thread
-        self.processing_thread = threading.Thread(target=self._process_audio)
         self.processing_thread.daemon = True
         self.processing_thread.start()
         
-        print("Started listening for speech...")
+        print("Started listening for speech..." + (" (partial transcripts on)" if self.partial_callback else ""))
     
     def stop_listening_method(self):
         """Stop speech recognition"""
@@ -57,69 +93,156 @@ class RealTimeSpeechRecognizer:
         self.is_running = False
         if self.stop_listening:
             self.stop_listening(wait_for_stop=False)
+        if self.vad and self.vad.phrases:
+            latency = self.vad.latency_stats()
+            print(f"🎚️ Endpointing: {latency['phrases']} phrases, cut {latency['mean'] * 1000:.0f} ms "
+                  f"(p95 {latency['p95'] * 1000:.0f} ms) after speech ended")
         print("Stopped listening for speech.")
     
     def _audio_callback(self, recognizer, audio):
         """Callback for when audio is detected"""
-        self.audio_queue.put(audio)
+        while True:
+            try:
+                self.audio_queue.put_nowait(audio)
+                return
+            except queue.Full:
+                # Recognition is behind - the oldest phrase is the least relevant
+                try:
+                    self.audio_queue.get_nowait()
+                    self.dropped_audio += 1
+                    print(f"⏭️ Dropped stale audio phrase ({self.dropped_audio} total)")
+                except queue.Empty:
+                    pass
     
     def _process_audio(self):
         """Process audio from the queue with enhanced recognition"""
-        consecutive_errors = 0
-        
         while self.is_running:
             try:
                 audio = self.audio_queue.get(timeout=1)
                 
-                # Try recognition with better error handling
-                try:
-                    # Primary attempt with standard settings
-                    text = self.recognizer.recognize_google(audio, language="en-US")
-                    if text.strip():
-                        print(f"Recognized: {text}")
-                        self.callback(text)
-                        consecutive_errors = 0  # Reset on success
-                        continue
-                except sr.UnknownValueError:
-                    # Try with show_all for alternatives
-                    try:
-                        result = self.recognizer.recognize_google(audio, show_all=True)
-                        if result and isinstance(result, dict) and 'alternative' in result:
-                            alternatives = result.get('alternative', [])
-                            if alternatives and alternatives[0].get('transcript'):
-                                text = alternatives[0]['transcript']
-                                confidence = alternatives[0].get('confidence', 1.0)
-                                if text.strip():
-                                    if confidence < 0.8:
-                                        print(f"Recognized (low confidence): {text}")
-                                    else:
-                                        print(f"Recognized: {text}")
-                                    self.callback(text)
-                                    consecutive_errors = 0
-                                    continue
-                    except:
-                        pass
-                
-                # Recognition failed
-                consecutive_errors += 1
-                self.error_count += 1
+                if self.record_dir:
+                    self._record_phrase(audio)
                 
-                # Provide helpful feedback
-                if consecutive_errors == 3:
-                    print("🎤 Having trouble hearing. Tips:")
-                    print("   • Speak louder and clearer")
-                    print("   • Get closer to the microphone")
-                    print("   • Reduce background noise")
-                elif consecutive_errors == 10:
-                    print("⚠️ Consistent issues detected - consider restarting")
-                elif self.error_count % 10 == 0:
-                    print(f"🔇 Audio unclear (shown every 10 attempts)")
+                self._handle_result(self.backend.transcribe(audio))
                     
             except queue.Empty:
                 continue
             except sr.RequestError as e:
                 print(f"❌ Speech recognition error: {e}")
-                print("   Check internet connection")
-                consecutive_errors += 1
+                print("   Check internet connection (or run with --asr vosk / --asr whisper)")
+                self.consecutive_errors += 1
             except Exception as e:
-                print(f"Unexpected error: {e}")
\ No newline at end of file
+                print(f"Unexpected error: {e}")
+    
+    def _capture_audio(self):
+        """Read the microphone and cut it into phrases with the voice activity detector"""
+        phrase_id = 0
+        with self.microphone as source:
+            self.vad = VoiceActivityDetector(source.SAMPLE_RATE, **self.vad_settings)
+            calibration_chunks = int(0.5 * source.SAMPLE_RATE / source.CHUNK) + 1
+            self.vad.calibrate(b"".join(source.stream.read(source.CHUNK) for _ in range(calibration_chunks)))
+            
+            while self.is_running:
+                for event in self.vad.process(source.stream.read(source.CHUNK)):
+                    if event[0] == 'start':
+                        phrase_id += 1
+                        self._put_stream_event(('start', phrase_id, source.SAMPLE_RATE, source.SAMPLE_WIDTH))
+                        self._put_stream_event(('audio', phrase_id, event[1]))
+                    elif event[0] == 'audio':
+                        self._put_stream_event(('audio', phrase_id, event[1]))
+                    else:
+                        print(f"🎚️ Phrase ended ({event[1] * 1000:.0f} ms after speech)")
+                        self._put_stream_event(('end', phrase_id))
+    
+    def _put_stream_event(self, event: tuple):
+        with self._stream_condition:
+            self.stream_events.append(event)
+            if event[0] == 'end':
+                self._drop_stale_phrases()
+            self._stream_condition.notify()
+    
+    def _drop_stale_phrases(self):
+        """Recognition is behind - drop the oldest finished phrases that haven't been started on"""
+        ended = {event[1] for event in self.stream_events if event[0] == 'end'}
+        waiting = [event[1] for event in self.stream_events if event[0] == 'start' and event[1] in ended]
+        for phrase_id in waiting[:max(0, len(waiting) - self.max_pending_audio)]:
+            self.stream_events = deque(event for event in self.stream_events if event[1] != phrase_id)
+            self.dropped_audio += 1
+            print(f"⏭️ Dropped stale audio phrase ({self.dropped_audio} total)")
+    
+    def _get_stream_event(self, timeout: float) -> Optional[tuple]:
+        with self._stream_condition:
+            if not self.stream_events:
+                self._stream_condition.wait(timeout)
+            return self.stream_events.popleft() if self.stream_events else None
+    
+    def _process_stream(self):
+        """Feed captured chunks to the backend, reporting partials and the final transcript per phrase"""
+        stream, phrase_id, audio, audio_format = None, None, bytearray(), None
+        
+        while self.is_running:
+            event = self._get_stream_event(timeout=1)
+            if event is None:
+                continue
+            
+            try:
+                if event[0] == 'start':
+                    phrase_id, audio_format = event[1], event[2:]
+                    stream = self.backend.stream(*audio_format,
+                                                 partial_interval=self.partial_interval if self.partial_callback else None)
+                    audio = bytearray()
+                elif event[0] == 'audio' and stream and event[1] == phrase_id:
+                    audio.extend(event[2])
+                    partial = stream.accept(event[2])
+                    if partial and self.partial_callback:
+                        print(f"💬 Partial: {partial}")
+                        self.partial_callback(partial, phrase_id)
+                elif event[0] == 'end' and stream and event[1] == phrase_id:
+                    result, stream = stream.finish(), None
+                    if self.record_dir:
+                        self._record_phrase(sr.AudioData(bytes(audio), *audio_format))
+                    self._handle_result(result, phrase_id)
+            except sr.RequestError as e:
+                stream = None  # Give up on this phrase; the next one starts fresh
+                print(f"❌ Speech recognition error: {e}")
+                print("   Check internet connection (or run with --asr vosk / --asr whisper)")
+                self.consecutive_errors += 1
+            except Exception as e:
+                stream = None
+                print(f"Unexpected error: {e}")
+    
+    def _handle_result(self, result, phrase_id: Optional[int] = None):
+        if result:
+            if result.confidence is not None and result.confidence < 0.8:
+                print(f"Recognized (low confidence): {result.text}")
+            else:
+                print(f"Recognized: {result.text}")
+            if len(result.alternatives) > 1:
+                print(f"   Alternatives: {' | '.join(result.alternatives[1:])}")
+            self.callback(result.text, result.alternatives, phrase_id=phrase_id)
+            self.consecutive_errors = 0  # Reset on success
+            return
+        
+        # Recognition failed
+        self.consecutive_errors += 1
+        self.error_count += 1
+        
+        # Provide helpful feedback
+        if self.consecutive_errors == 3:
+            print("🎤 Having trouble hearing. Tips:")
+            print("   • Speak louder and clearer")
+            print("   • Get closer to the microphone")
+            print("   • Reduce background noise")
+        elif self.consecutive_errors == 10:
+            print("⚠️ Consistent issues detected - consider restarting")
+        elif self.error_count % 10 == 0:
+            print(f"🔇 Audio unclear (shown every 10 attempts)")
+    
+    def _record_phrase(self, audio):
+        self.recorded_phrases += 1
+        filepath = os.path.join(self.record_dir, f"phrase_{time.strftime('%Y%m%d_%H%M%S')}_{self.recorded_phrases:04d}.wav")
+        try:
+            with open(filepath, 'wb') as f:
+                f.write(audio.get_wav_data())
+        except OSError as e:
+            print(f"⚠️ Could not save phrase audio: {e}")
\ No newline at end of file
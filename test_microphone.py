@@ -9,6 +9,7 @@ import speech_recognition as sr
 import numpy as np
 import time
 import sys
+from voice_activity import load_profile, segment
 
 def test_microphone():
     """Test microphone and provide setup recommendations"""
@@ -78,6 +79,8 @@ def test_microphone():
     print("(Press Ctrl+C to skip any phrase)\n")
     
     successful_recognitions = 0
+    vad_settings = load_profile()
+    endpoint_savings = []
     
     for i, phrase in enumerate(test_phrases, 1):
         print(f"\n[{i}/4] Please say: \"{phrase}\"")
@@ -88,6 +91,13 @@ def test_microphone():
                 # Listen for up to 10 seconds
                 audio = recognizer.listen(source, timeout=10, phrase_time_limit=10)
             
+            # How much sooner voice activity endpointing would have ended the same line
+            phrases = segment(audio.get_raw_data(convert_width=2), audio.sample_rate, **vad_settings)
+            if phrases:
+                saved = len(audio.frame_data) / (audio.sample_rate * audio.sample_width) - phrases[-1][1]
+                endpoint_savings.append(saved)
+                print(f"\n🎚️ VAD would have ended this line {saved * 1000:.0f} ms sooner", end='')
+            
             # Try to recognize
             try:
                 recognized = recognizer.recognize_google(audio)
@@ -126,6 +136,9 @@ def test_microphone():
     
     success_rate = (successful_recognitions / len(test_phrases)) * 100
     print(f"\nRecognition success rate: {success_rate:.0f}%")
+    if endpoint_savings:
+        print(f"Voice activity endpointing: lines end {np.mean(endpoint_savings) * 1000:.0f} ms sooner on average "
+              f"than with the fixed {recognizer.pause_threshold:.1f}s pause")
     
     if success_rate >= 75:
         print("✅ Excellent! Your microphone setup is ready for Improv AI")
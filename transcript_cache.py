@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+"""
+Two-level memoization of transcript → classification results.
+
+Improvisers repeat themselves constantly ("let's go to the park", "Let's go
+to the park!"). Results of the detection, extraction and fused LLM calls are
+cached under a normalized transcript: first in an in-memory LRU, then in
+generated_images/transcript_cache.db (SQLite) so they survive restarts.
+Entries expire after a TTL and both levels are size-bounded.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+DB_FILENAME = "transcript_cache.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL,
+    last_used_at REAL
+)
+"""
+
+# Hesitations that don't change what was said
+FILLER_WORDS = {'um', 'uh', 'uhm', 'umm', 'er', 'erm', 'ah', 'hmm', 'mm'}
+
+_MISSING = object()
+
+def normalize_transcript(text: str) -> str:
+    """Lowercase, drop punctuation and filler words, collapse whitespace"""
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    return ' '.join(word for word in words if word not in FILLER_WORDS)
+
+class TranscriptCache:
+    def __init__(self, cache_dir: str = "generated_images", db_filename: str = DB_FILENAME,
+                 memory_entries: int = 256, disk_entries: int = 5000, ttl: float = 7 * 24 * 3600):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl  # Seconds; classifications go stale as prompts and the library change
+        self.db_path = os.path.join(cache_dir, db_filename)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, created_at)
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+        self.conn = None
+        try:
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(SCHEMA)
+            self.conn.commit()
+            self._purge_expired()
+        except sqlite3.Error as e:
+            print(f"⚠️ Transcript cache is memory-only ({e})")
+            self.conn = None
+
+    @staticmethod
+    def make_key(namespace: str, speech_text: str) -> str:
+        return f"{namespace}:{normalize_transcript(speech_text)}"
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl
+
+    def get(self, namespace: str, speech_text: str, default: Any = None) -> Any:
+        """Cached result for a transcript, checking memory then disk"""
+        key = self.make_key(namespace, speech_text)
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                value, created_at = cached
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+                self._stats['expired'] += 1
+
+            value = self._disk_get(key)
+            if value is not _MISSING:
+                self._stats['disk_hits'] += 1
+                return value
+
+            self._stats['misses'] += 1
+            return default
+
+    def put(self, namespace: str, speech_text: str, value: Any):
+        key = self.make_key(namespace, speech_text)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self.conn is None:
+                return
+            try:
+                self.conn.execute("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?)",
+                                  (key, json.dumps(value), now, now))
+                self._evict_disk()
+                self.conn.commit()
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"⚠️ Could not persist transcript cache entry: {e}")
+
+    def _remember(self, key: str, value: Any, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._stats['evicted'] += 1
+
+    def _disk_get(self, key: str) -> Any:
+        if self.conn is None:
+            return _MISSING
+        try:
+            row = self.conn.execute("SELECT value, created_at FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return _MISSING
+            value, created_at = json.loads(row[0]), row[1]
+            if self._expired(created_at):
+                self.conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+                self.conn.commit()
+                self._stats['expired'] += 1
+                return _MISSING
+            self.conn.execute("UPDATE transcripts SET last_used_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        except (sqlite3.Error, ValueError):
+            return _MISSING
+        # Promote to memory so the next repeat doesn't touch disk
+        self._remember(key, value, created_at)
+        return value
+
+    def _evict_disk(self):
+        """Drop least recently used rows beyond the disk bound"""
+        count = self.conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        excess = count - self.disk_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM transcripts WHERE key IN "
+                "(SELECT key FROM transcripts ORDER BY last_used_at ASC LIMIT ?)", (excess,))
+            self._stats['evicted'] += excess
+
+    def _purge_expired(self):
+        cursor = self.conn.execute("DELETE FROM transcripts WHERE created_at < ?", (time.time() - self.ttl,))
+        self.conn.commit()
+        self._stats['expired'] += max(cursor.rowcount, 0)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM transcripts")
+                self.conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_size'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+Latest-wins handoff between the speech recognizer and the pipeline.
+
+Utterances said close together are merged into one, utterances that sat
+around longer than max_age are dropped, and when the queue is full the
+least important, oldest utterance makes room. Backgrounds follow what the
+performers are saying now.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+class UtteranceQueue:
+    def __init__(self, capacity: int = 4, max_age: float = 12.0, merge_window: float = 2.5,
+                 max_merge_words: int = 40):
+        self.capacity = capacity
+        self.max_age = max_age  # Seconds before a pending utterance is considered stale
+        self.merge_window = merge_window  # Utterances closer than this are merged
+        self.max_merge_words = max_merge_words
+        self._pending: List[dict] = []
+        self._condition = threading.Condition()
+
+        # Counters
+        self.dropped = 0
+        self.merged = 0
+        self.processed = 0
+
+    def put(self, text: str, priority: int = 0, heard_at: Optional[float] = None, extra: Optional[dict] = None):
+        """Add an utterance, merging it with the previous one if they were said together.
+
+        Utterances with a phrase_id in extra are hypotheses for one spoken
+        phrase (partials, then the final transcript): a newer one replaces a
+        pending one for the same phrase instead of being appended to it.
+        """
+        heard_at = heard_at or time.time()
+        extra = extra or {}
+        phrase_id = extra.get('phrase_id')
+
+        with self._condition:
+            same_phrase = next((u for u in self._pending if phrase_id is not None and u.get('phrase_id') == phrase_id), None)
+            if same_phrase:
+                same_phrase.update(extra, text=text, priority=max(same_phrase['priority'], priority))
+                self._condition.notify()
+                return
+
+            last = self._pending[-1] if self._pending else None
+            if (last and phrase_id is None and last.get('phrase_id') is None
+                    and 0 <= heard_at - last['heard_at'] <= self.merge_window
+                    and len(last['text'].split()) + len(text.split()) <= self.max_merge_words):
+                last['text'] = f"{last['text']} {text}"
+                last['priority'] = max(last['priority'], priority)
+                last['heard_at'] = heard_at
+                self.merged += 1
+            else:
+                if len(self._pending) >= self.capacity:
+                    self._drop(min(self._pending, key=lambda u: (u['priority'], u['heard_at'])), "queue full")
+                self._pending.append(dict(extra, text=text, priority=priority, heard_at=heard_at))
+
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Return the most important fresh utterance (newest wins ties), or None on timeout"""
+        with self._condition:
+            deadline = time.time() + timeout if timeout is not None else None
+            while True:
+                self._drop_stale()
+                if self._pending:
+                    break
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+            chosen = max(self._pending, key=lambda u: (u['priority'], u['heard_at']))
+
+            # Anything older and no more important has been overtaken by the scene
+            for utterance in list(self._pending):
+                if utterance is not chosen and utterance['heard_at'] < chosen['heard_at'] \
+                        and utterance['priority'] <= chosen['priority']:
+                    self._drop(utterance, "superseded")
+
+            self._pending.remove(chosen)
+            self.processed += 1
+            return chosen
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending)
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                'pending': len(self._pending),
+                'processed': self.processed,
+                'merged': self.merged,
+                'dropped': self.dropped
+            }
+
+    def _drop_stale(self):
+        cutoff = time.time() - self.max_age
+        for utterance in [u for u in self._pending if u['heard_at'] < cutoff]:
+            self._drop(utterance, "stale")
+
+    def _drop(self, utterance: dict, reason: str):
+        self._pending.remove(utterance)
+        self.dropped += 1
+        print(f"⏭️ Dropping {reason} utterance: '{utterance['text']}'")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+"""
+NumPy voice-activity detection and endpointing for the speech recognizer.
+
+Raw 16-bit PCM is cut into 20 ms frames and every batch of frames is
+scored at once: log energy against a noise floor that follows the room,
+zero-crossing rate, the share of energy in the 300-3400 Hz speech band and
+spectral flatness (laughter, applause and air handling are flat; voiced
+speech is not). A phrase opens after `onset` seconds of speech and closes
+after a hangover of silence - min_hangover when the room has clearly gone
+quiet, max_hangover while it is still noisy - instead of a fixed 1.5 s
+pause. The silence waited before each cut is reported as endpointing
+latency.
+
+Settings come from a venue profile in vad_profiles.json. Try a profile on
+recorded phrases (see --record-audio in main.py):
+  python voice_activity.py recordings/ --profile small_club
+"""
+
+import argparse
+import glob
+import json
+import os
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vad_profiles.json")
+FRAME_SECONDS = 0.02
+SPEECH_BAND = (300.0, 3400.0)
+
+def _read_profiles(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return {name: settings for name, settings in json.load(f).items() if not name.startswith('_')}
+
+def profile_names(path: str = PROFILES_PATH) -> List[str]:
+    """Venue profiles defined in vad_profiles.json"""
+    return list(_read_profiles(path))
+
+def load_profile(name: str = "default", path: str = PROFILES_PATH) -> dict:
+    """Settings of a venue profile, on top of the default profile"""
+    profiles = _read_profiles(path)
+    if name not in profiles:
+        raise ValueError(f"Unknown VAD profile '{name}' (available: {', '.join(profiles)})")
+    return dict(profiles['default'], **profiles[name])
+
+def frame_features(frames: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, ...]:
+    """(energy dB, zero-crossing rate, speech-band ratio, spectral flatness) for an (n, frame) float array"""
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    zero_crossings = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), axis=1)) ** 2 + 1e-12
+    freqs = np.fft.rfftfreq(frames.shape[1], 1.0 / sample_rate)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    band_ratio = spectrum[:, band].sum(axis=1) / spectrum.sum(axis=1)
+    flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+    return energy_db, zero_crossings, band_ratio, flatness
+
+class VoiceActivityDetector:
+    def __init__(self, sample_rate: int, energy_margin_db: float = 12.0, min_band_ratio: float = 0.2,
+                 max_flatness: float = 0.4, max_zcr: float = 0.35, onset: float = 0.08,
+                 min_hangover: float = 0.4, max_hangover: float = 0.8, pre_roll: float = 0.3,
+                 max_phrase: float = 15.0, noise_adapt: float = 3.0):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * FRAME_SECONDS)
+        self.energy_margin_db = energy_margin_db
+        self.min_band_ratio = min_band_ratio
+        self.max_flatness = max_flatness
+        self.max_zcr = max_zcr
+        self.onset_frames = max(1, round(onset / FRAME_SECONDS))
+        self.min_hangover = min_hangover
+        self.max_hangover = max_hangover
+        self.max_phrase = max_phrase
+        self.noise_rate = FRAME_SECONDS / noise_adapt  # Per-frame step of the noise floor towards the room level
+
+        self.noise_db: Optional[float] = None
+        self.in_phrase = False
+        self._leftover = np.zeros(0, dtype=np.int16)
+        self._pre_roll = deque(maxlen=max(1, round(pre_roll / FRAME_SECONDS)))
+        self._speech_run = 0
+        self._silence = 0.0
+        self._phrase_length = 0.0
+        self._frames = 0  # Frames processed so far, for phrase timings
+        self.phrases: List[Tuple[float, float, float]] = []  # (start, end, silence waited before the cut) in seconds
+
+    @classmethod
+    def from_profile(cls, sample_rate: int, profile: str = "default", path: str = PROFILES_PATH) -> "VoiceActivityDetector":
+        return cls(sample_rate, **load_profile(profile, path))
+
+    def calibrate(self, pcm: bytes):
+        """Start the noise floor from a stretch of room tone"""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        count = len(samples) // self.frame_length
+        if count:
+            frames = samples[:count * self.frame_length].reshape(count, -1).astype(np.float32) / 32768.0
+            self.noise_db = float(np.median(frame_features(frames, self.sample_rate)[0]))
+
+    def process(self, pcm: bytes) -> List[tuple]:
+        """Feed captured PCM; returns ('start', pre-roll bytes), ('audio', bytes) and ('end', delay) events in order"""
+        samples = np.concatenate([self._leftover, np.frombuffer(pcm, dtype=np.int16)])
+        count = len(samples) // self.frame_length
+        self._leftover = samples[count * self.frame_length:]
+        if not count:
+            return []
+
+        frames_int = samples[:count * self.frame_length].reshape(count, self.frame_length)
+        energy_db, zcr, band_ratio, flatness = frame_features(frames_int.astype(np.float32) / 32768.0, self.sample_rate)
+        if self.noise_db is None:
+            self.noise_db = float(energy_db.min())
+        voiced = (band_ratio >= self.min_band_ratio) & (flatness <= self.max_flatness) & (zcr <= self.max_zcr)
+
+        events, audio = [], bytearray()
+        for i in range(count):
+            self._frames += 1
+            frame = frames_int[i].tobytes()
+            speech = bool(voiced[i]) and energy_db[i] > self.noise_db + self.energy_margin_db
+            if not speech:
+                # Follow the room: quickly down, slowly up, and never while someone is talking
+                if energy_db[i] < self.noise_db:
+                    self.noise_db = float(energy_db[i])
+                else:
+                    self.noise_db += self.noise_rate * (float(energy_db[i]) - self.noise_db)
+
+            if not self.in_phrase:
+                self._speech_run = self._speech_run + 1 if speech else 0
+                self._pre_roll.append(frame)
+                if self._speech_run >= self.onset_frames:
+                    self.in_phrase = True
+                    self._silence, self._phrase_length = 0.0, len(self._pre_roll) * FRAME_SECONDS
+                    events.append(('start', b"".join(self._pre_roll)))
+                    self._pre_roll.clear()
+                continue
+
+            audio.extend(frame)
+            self._phrase_length += FRAME_SECONDS
+            self._silence = 0.0 if speech else self._silence + FRAME_SECONDS
+            # A clearly quiet room ends the phrase sooner than one still full of noise
+            quiet = energy_db[i] < self.noise_db + self.energy_margin_db / 2
+            hangover = self.min_hangover if quiet else self.max_hangover
+            if self._silence >= hangover or self._phrase_length >= self.max_phrase:
+                events.append(('audio', bytes(audio)))
+                events.append(('end', self._silence))
+                end = self._frames * FRAME_SECONDS
+                self.phrases.append((max(0.0, end - self._phrase_length), end, self._silence))
+                audio = bytearray()
+                self.in_phrase, self._speech_run = False, 0
+
+        if audio:
+            events.append(('audio', bytes(audio)))
+        return events
+
+    def latency_stats(self) -> dict:
+        """Endpointing latency: silence waited before cutting each phrase"""
+        delays = np.array([delay for _, _, delay in self.phrases])
+        return {
+            'phrases': len(delays),
+            'mean': float(delays.mean()) if len(delays) else 0.0,
+            'p95': float(np.percentile(delays, 95)) if len(delays) else 0.0,
+        }
+
+def segment(pcm: bytes, sample_rate: int, **settings) -> List[Tuple[float, float, float]]:
+    """(start, end, endpoint delay) in seconds for every phrase in a recording"""
+    detector = VoiceActivityDetector(sample_rate, **settings)
+    detector.process(pcm)
+    return detector.phrases
+
+def main():
+    import speech_recognition as sr
+
+    parser = argparse.ArgumentParser(description='🎭 Improv AI - try voice activity endpointing on recorded audio')
+    parser.add_argument('recordings', nargs='+', help='.wav files or folders of them')
+    parser.add_argument('--profile', default='default', choices=profile_names(),
+                        help='Venue profile from vad_profiles.json (default: default)')
+    args = parser.parse_args()
+
+    settings = load_profile(args.profile)
+    files = []
+    for path in args.recordings:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.wav"))) if os.path.isdir(path) else [path])
+
+    delays = []
+    for path in files:
+        with sr.AudioFile(path) as source:
+            audio = sr.Recognizer().record(source)
+        # Trailing silence so a phrase running to the end of the file still gets cut
+        pcm = audio.get_raw_data(convert_width=2) + bytes(int(audio.sample_rate * (settings['max_hangover'] + 0.1)) * 2)
+        phrases = segment(pcm, audio.sample_rate, **settings)
+        delays.extend(delay for _, _, delay in phrases)
+        spans = ", ".join(f"{start:.2f}-{end:.2f}s" for start, end, _ in phrases) or "no speech"
+        print(f"🎙️ {os.path.basename(path)}: {spans}")
+
+    if delays:
+        print(f"\n🎚️ Profile '{args.profile}': {len(delays)} phrase(s), endpointing latency "
+              f"mean {np.mean(delays) * 1000:.0f} ms, p95 {np.percentile(delays, 95) * 1000:.0f} ms "
+              f"(fixed pause threshold: 1500 ms)")
+
+if __name__ == "__main__":
+    main()